@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+
+# -----------------------------------------------------------------------------
+#  Glyph set definitions for pymorph.py
+# -----------------------------------------------------------------------------
+# A glyph set is a dict (or a .json file of the same shape) with:
+#
+#   "name"         - short name of the set
+#   "segments"     - segment names in table order (the first is the highest bit)
+#   "segmentEnums" - (optional) spin2 enum name for each segment, default "SEG_<NAME>"
+#   "junctions"    - list of places where segment ends meet. Each junction is a list
+#                    of [segment, direction] where direction is the way one travels
+#                    along that segment to reach the junction (up, down, left, right)
+#                    or None when the junction touches the middle of the segment.
+#                    Segments at the same junction are adjacent. Junction (and member)
+#                    order is the order in which adjacent segments are preferred.
+#   "sliding"      - list of [sliding segment, source segment] pairs: segments which
+#                    can move as a whole column to/from their source
+#   "glyphs"       - list of [label, "space separated lit segment names"]
+#   "search"       - (optional) search objective used when none is asked for (see
+#                    pymorph.searchObjectiveSet), for sets where the first rule which
+#                    fits leaves segments without an action: a search turns those
+#                    on with CMD_IMMEDIATE and snakes them off along themselves
+#
+# Labels are used to name the generated tables (e.g., fmA_B) so must be valid
+#  spin2 symbol characters.
+#
+# NOTE: the spin2 source tables (-f spin) hold byte actions naming the SEG_* enums
+#  of the seven segment driver, sets with more segments are written with -f dat
+#  or -f bin (word actions) only.
+
+# -----------------------------------------------------------------------------
+#  Seven segment displays
+# -----------------------------------------------------------------------------
+#    --- a ---
+#   |         |
+#   f         b
+#   |         |
+#    --- g ---
+#   |         |
+#   e         c
+#   |         |
+#    --- d ---
+#
+sevenSegmentGeometry = {
+    "segments": ["a", "b", "c", "d", "e", "f", "g"],
+    "segmentEnums": ["SEG_TOP_A", "SEG_RIGHT_B", "SEG_RIGHT_C", "SEG_BOTTOM_D", "SEG_LEFT_E", "SEG_LEFT_F", "SEG_MIDDLE_G"],
+    "junctions": [
+        [("a", "right"), ("b", "up")],                  # top right
+        [("a", "left"), ("f", "up")],                   # top left
+        [("b", "down"), ("c", "up"), ("g", "right")],   # middle right
+        [("c", "down"), ("d", "right")],                # bottom right
+        [("d", "left"), ("e", "down")],                 # bottom left
+        [("g", "left"), ("e", "up"), ("f", "down")],    # middle left
+    ],
+    "sliding": [("e", "c"), ("f", "b")],
+}
+
+digitGlyphs = [
+    ("0", "a b c d e f"),
+    ("1", "b c"),
+    ("2", "a b d e g"),
+    ("3", "a b c d g"),
+    ("4", "b c f g"),
+    ("5", "a c d f g"),
+    ("6", "a c d e f g"),
+    ("7", "a b c"),
+    ("8", "a b c d e f g"),
+    ("9", "a b c d f g"),
+]
+
+hexGlyphs = digitGlyphs + [
+    ("A", "a b c e f g"),
+    ("B", "c d e f g"),         # b
+    ("C", "a d e f"),
+    ("D", "b c d e g"),         # d
+    ("E", "a d e f g"),
+    ("F", "a e f g"),
+]
+
+# NOTE: k, m, v, w and x have no good seven segment form, these are the usual approximations
+letterGlyphs = [
+    ("a", "a b c d e g"),
+    ("b", "c d e f g"),
+    ("c", "d e g"),
+    ("d", "b c d e g"),
+    ("e", "a b d e f g"),
+    ("f", "a e f g"),
+    ("g", "a b c d f g"),
+    ("h", "c e f g"),
+    ("i", "c"),
+    ("j", "b c d"),
+    ("k", "a c e f g"),
+    ("l", "d e f"),
+    ("m", "a c e g"),
+    ("n", "c e g"),
+    ("o", "c d e g"),
+    ("p", "a b e f g"),
+    ("q", "a b c f g"),
+    ("r", "e g"),
+    ("s", "a c d f g"),
+    ("t", "d e f g"),
+    ("u", "c d e"),
+    ("v", "b c d e f"),
+    ("w", "b d f g"),
+    ("x", "b c e f g"),
+    ("y", "b c d f g"),
+    ("z", "a b d e g"),
+]
+
+# -----------------------------------------------------------------------------
+#  Fourteen segment displays
+# -----------------------------------------------------------------------------
+#    ----- a -----
+#   |\     |     /|
+#   f  h   i   j  b
+#   |    \ | /    |
+#    -g1--   --g2-
+#   |    / | \    |
+#   e  k   l   m  c
+#   |/     |     \|
+#    ----- d -----
+#
+fourteenSegmentGeometry = {
+    "segments": ["a", "b", "c", "d", "e", "f", "g1", "g2", "h", "i", "j", "k", "l", "m"],
+    "junctions": [
+        [("a", "right"), ("b", "up"), ("j", "up")],                     # top right
+        [("a", "left"), ("f", "up"), ("h", "up")],                      # top left
+        [("a", None), ("i", "up")],                                     # top center
+        [("b", "down"), ("c", "up"), ("g2", "right")],                  # middle right
+        [("g1", "right"), ("g2", "left"), ("h", "down"), ("i", "down"), ("j", "down"),
+            ("k", "up"), ("l", "up"), ("m", "up")],                     # center
+        [("c", "down"), ("d", "right"), ("m", "down")],                 # bottom right
+        [("d", None), ("l", "down")],                                   # bottom center
+        [("d", "left"), ("e", "down"), ("k", "down")],                  # bottom left
+        [("g1", "left"), ("e", "up"), ("f", "down")],                   # middle left
+    ],
+    "sliding": [("e", "c"), ("f", "b")],
+}
+
+alphanumeric14Glyphs = [
+    ("0", "a b c d e f j k"),
+    ("1", "b c j"),
+    ("2", "a b d e g1 g2"),
+    ("3", "a b c d g2"),
+    ("4", "b c f g1 g2"),
+    ("5", "a c d f g1 g2"),
+    ("6", "a c d e f g1 g2"),
+    ("7", "a b c"),
+    ("8", "a b c d e f g1 g2"),
+    ("9", "a b c d f g1 g2"),
+    ("A", "a b c e f g1 g2"),
+    ("B", "a b c d g2 i l"),
+    ("C", "a d e f"),
+    ("D", "a b c d i l"),
+    ("E", "a d e f g1"),
+    ("F", "a e f g1"),
+    ("G", "a c d e f g2"),
+    ("H", "b c e f g1 g2"),
+    ("I", "a d i l"),
+    ("J", "b c d e"),
+    ("K", "e f g1 j m"),
+    ("L", "d e f"),
+    ("M", "b c e f h j"),
+    ("N", "b c e f h m"),
+    ("O", "a b c d e f"),
+    ("P", "a b e f g1 g2"),
+    ("Q", "a b c d e f m"),
+    ("R", "a b e f g1 g2 m"),
+    ("S", "a c d g2 h"),
+    ("T", "a i l"),
+    ("U", "b c d e f"),
+    ("V", "e f j k"),
+    ("W", "b c e f k m"),
+    ("X", "h j k m"),
+    ("Y", "h j l"),
+    ("Z", "a d j k"),
+]
+
+# -----------------------------------------------------------------------------
+#  Sixteen segment displays (a and d are split in two)
+# -----------------------------------------------------------------------------
+#    --a1-- --a2--
+#   |\     |     /|
+#   f  h   i   j  b
+#   |    \ | /    |
+#    -g1--   --g2-
+#   |    / | \    |
+#   e  k   l   m  c
+#   |/     |     \|
+#    --d1-- --d2--
+#
+sixteenSegmentGeometry = {
+    "segments": ["a1", "a2", "b", "c", "d2", "d1", "e", "f", "g1", "g2", "h", "i", "j", "k", "l", "m"],
+    "junctions": [
+        [("a2", "right"), ("b", "up"), ("j", "up")],                    # top right
+        [("a1", "left"), ("f", "up"), ("h", "up")],                     # top left
+        [("a1", "right"), ("a2", "left"), ("i", "up")],                 # top center
+        [("b", "down"), ("c", "up"), ("g2", "right")],                  # middle right
+        [("g1", "right"), ("g2", "left"), ("h", "down"), ("i", "down"), ("j", "down"),
+            ("k", "up"), ("l", "up"), ("m", "up")],                     # center
+        [("c", "down"), ("d2", "right"), ("m", "down")],                # bottom right
+        [("d1", "right"), ("d2", "left"), ("l", "down")],               # bottom center
+        [("d1", "left"), ("e", "down"), ("k", "down")],                 # bottom left
+        [("g1", "left"), ("e", "up"), ("f", "down")],                   # middle left
+    ],
+    "sliding": [("e", "c"), ("f", "b")],
+}
+
+def splitTopAndBottom(glyphs):
+    # return fourteen segment glyphs with [a] and [d] replaced by their sixteen segment halves
+    halves = {"a": "a1 a2", "d": "d1 d2"}
+    return [(label, " ".join(halves.get(segName, segName) for segName in segments.split())) for label, segments in glyphs]
+
+alphanumeric16Glyphs = splitTopAndBottom(alphanumeric14Glyphs)
+
+# -----------------------------------------------------------------------------
+#  Stock glyph sets (by name)
+# -----------------------------------------------------------------------------
+def glyphSet(name, geometry, glyphs, search=None):
+    # return glyph set definition combining a display geometry with glyphs
+    #  search: objective used when none is asked for, None for the first rule which fits
+    definition = dict(geometry)
+    definition["name"] = name
+    definition["glyphs"] = glyphs
+    if search is not None:
+        definition["search"] = search
+    return definition
+
+glyphSetDict = {
+    "digits": glyphSet("digits", sevenSegmentGeometry, digitGlyphs),
+    "hex": glyphSet("hex", sevenSegmentGeometry, hexGlyphs),
+    # the first rule which fits leaves segments of these without an action
+    "letters": glyphSet("letters", sevenSegmentGeometry, letterGlyphs, "frames"),
+    "alnum14": glyphSet("alnum14", fourteenSegmentGeometry, alphanumeric14Glyphs, "frames"),
+    "alnum16": glyphSet("alnum16", sixteenSegmentGeometry, alphanumeric16Glyphs, "frames"),
+}
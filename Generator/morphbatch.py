@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# -----------------------------------------------------------------------------
+#  Batch generation of many transition tables with pymorph.py
+# -----------------------------------------------------------------------------
+# Each job (a glyph set with its search settings and output format) is generated
+#  by a pool of worker processes. Workers return the table content, the main
+#  process writes the files in job order, so the output (and what is printed) is
+#  the same whatever the number of workers.
+#
+# Jobs come from the command line (every glyph set named, with the same settings)
+#  or from a .json file holding a list of jobs such as:
+#
+#   [{"glyph_set": "hex", "search": "pixels", "segment_length": 9, "segment_width": 2,
+#     "out_format": "dat", "out_filename": "tables/hex9.dat"}, ...]
+#
+# where all but "glyph_set" are optional (defaults as for pymorph.py, the file
+#  is named after the glyph set in the --out_dir directory).
+
+import os
+import sys
+import json
+import argparse
+from signal import signal, SIGPIPE, SIG_DFL
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import pymorph
+import morphcache
+import tablewrite
+
+script_version = "0.1.0"
+script_name = 'morphbatch.py'
+script_info = '{} v{}'.format(script_name, script_version)
+
+# file name extension for each output format
+extensionDict = {"spin": ".out", "dat": ".dat", "bin": ".bin"}
+
+# one table to generate
+BatchJob = namedtuple('BatchJob', ['glyphSet', 'search', 'segmentLength', 'segmentWidth', 'outFormat', 'outFilename'])
+
+# what a worker returns for a job
+#   content - the table as written by pymorph.py -o (bytes for bin)
+#   cacheEntries - results the worker added to the cache (merged by the main process)
+BatchResult = namedtuple('BatchResult', ['job', 'content', 'transitionCount', 'missingCount', 'cacheEntries'])
+
+def jobsFromFile(filename, out_dir):
+    # return list of BatchJob read from a .json list of job dicts
+    with open(filename) as job_fp:
+        jobList = json.load(job_fp)
+    if not isinstance(jobList, list):
+        raise ValueError("{} doesn't hold a list of jobs".format(filename))
+    jobs = []
+    for jobIdx, jobDict in enumerate(jobList):
+        if not isinstance(jobDict, dict) or "glyph_set" not in jobDict:
+            raise ValueError("Job {} in {} isn't a dict of settings with a \"glyph_set\"".format(jobIdx + 1, filename))
+        unknownKeys = set(jobDict) - set(["glyph_set", "search", "segment_length", "segment_width", "out_format", "out_filename"])
+        if len(unknownKeys) > 0:
+            raise ValueError("Unknown job setting(s) {} in {}".format(sorted(unknownKeys), filename))
+        jobs.append(jobFor(jobDict["glyph_set"], jobDict.get("search"), jobDict.get("segment_length", pymorph.defaultSegmentLength),
+                           jobDict.get("out_format", "spin"), out_dir, jobDict.get("out_filename"), jobDict.get("segment_width", 1)))
+    return jobs
+
+def jobFor(glyphSet, search, segmentLength, outFormat, out_dir, outFilename=None, segmentWidth=1):
+    # return BatchJob, naming the output file after the glyph set when none is given
+    if search is not None and search not in pymorph.searchObjectiveSet:
+        raise ValueError("Unknown search objective [{}], expected one of {}".format(search, pymorph.searchObjectiveSet))
+    if outFormat not in extensionDict:
+        raise ValueError("Unknown output format [{}], expected one of {}".format(outFormat, sorted(extensionDict)))
+    if not all(isinstance(value, int) and not isinstance(value, bool) for value in (segmentLength, segmentWidth)):
+        raise ValueError("Segment length and width of [{}] must be whole numbers".format(glyphSet))
+    pymorph.checkSegmentSize(segmentLength, segmentWidth)
+    if outFilename is None:
+        baseName = os.path.splitext(os.path.basename(glyphSet))[0]
+        outFilename = os.path.join(out_dir, baseName + extensionDict[outFormat])
+    return BatchJob(glyphSet, search, segmentLength, segmentWidth, outFormat, outFilename)
+
+# the cache used by the jobs of this process, see initWorker()
+workerCache = None
+
+def initWorker(cacheFilename):
+    # load the cache file once for all the jobs a (worker) process runs
+    global workerCache
+    workerCache = morphcache.TransitionCache(cacheFilename) if cacheFilename else None
+
+def generateJob(job):
+    # return BatchResult for a job (runs in a worker process, after initWorker())
+    engine = pymorph.engineForGlyphSet(pymorph.loadGlyphSet(job.glyphSet), job.search, job.segmentLength, workerCache, job.segmentWidth)
+    results = list(engine.transitions())
+    content = pymorph.tableOutputFor(results, engine, job.outFormat)
+    missingCount = sum(len(result.missing) for result in results)
+    cacheEntries = {}
+    if workerCache is not None:
+        # only this job's entries are returned, later jobs of the worker still hit them
+        cacheEntries, workerCache.added = workerCache.added, {}
+    return BatchResult(job, content, len(results), missingCount, cacheEntries)
+
+def generateJobs(jobs, workerCount=None, cacheFilename=None):
+    # generate BatchResults in job order, using workerCount processes (default: one per CPU)
+    #  a single worker generates in this process
+    if workerCount == 1 or len(jobs) <= 1:
+        initWorker(cacheFilename)
+        for job in jobs:
+            yield generateJob(job)
+        return
+    with ProcessPoolExecutor(max_workers=workerCount, initializer=initWorker, initargs=(cacheFilename,)) as executor:
+        for batchResult in executor.map(generateJob, jobs):
+            yield batchResult
+
+# -----------------------------------------------------------------------------
+#  main application
+# -----------------------------------------------------------------------------
+def main(argv=None):
+    signal(SIGPIPE,SIG_DFL)
+
+    parser = argparse.ArgumentParser(description=script_info, epilog='For further details see: ' + pymorph.project_url)
+    parser.add_argument('glyph_sets', help='glyph sets to generate (stock names or .json definition files)', nargs='*')
+    parser.add_argument("-j", '--jobs_file', help='.json file listing the jobs to run (in addition to any glyph sets named)', default='')
+    parser.add_argument('--out_dir', help='directory for output files not named by a job (default: .)', default='.')
+    parser.add_argument("-f", '--out_format', help='output format for the glyph sets named', choices=sorted(extensionDict), default='spin')
+    parser.add_argument("-s", '--search', help='search objective for the glyph sets named', choices=pymorph.searchObjectiveSet, default=None)
+    parser.add_argument("-l", '--segment_length', help='segment length for the glyph sets named (default: {})'.format(pymorph.defaultSegmentLength), type=pymorph.segmentLengthArg, default=pymorph.defaultSegmentLength)
+    parser.add_argument("-w", '--segment_width', help='segment width for the glyph sets named (default: 1)', type=pymorph.segmentWidthArg, default=1)
+    parser.add_argument('--workers', help='number of worker processes (default: one per CPU)', type=int, default=None)
+    parser.add_argument("-c", '--cache_file', help='cache file shared by all jobs (see pymorph.py -c)', default='')
+    parse_args = parser.parse_args(argv)
+
+    try:
+        jobs = [jobFor(glyphSet, parse_args.search, parse_args.segment_length, parse_args.out_format, parse_args.out_dir, segmentWidth=parse_args.segment_width)
+                for glyphSet in parse_args.glyph_sets]
+        if len(parse_args.jobs_file) > 0:
+            jobs.extend(jobsFromFile(parse_args.jobs_file, parse_args.out_dir))
+        # fail before starting any work when a glyph set can't be found (or written in its format)
+        for job in jobs:
+            pymorph.checkOutputFormat(pymorph.modelForGlyphSet(pymorph.loadGlyphSet(job.glyphSet)), job.outFormat)
+    except (ValueError, KeyError) as error:
+        print('{}: {}'.format(script_name, error), file=sys.stderr)
+        return 1
+    if len(jobs) == 0:
+        parser.error("no glyph sets or jobs file given")
+    outFilenames = [job.outFilename for job in jobs]
+    if len(set(outFilenames)) != len(outFilenames):
+        print('{}: more than one job writes the same output file'.format(script_name), file=sys.stderr)
+        return 1
+
+    cache = morphcache.TransitionCache(parse_args.cache_file) if len(parse_args.cache_file) > 0 else None
+    try:
+        for batchResult in generateJobs(jobs, parse_args.workers, parse_args.cache_file):
+            job = batchResult.job
+            outDir = os.path.dirname(job.outFilename)
+            if len(outDir) > 0 and not os.path.isdir(outDir):
+                os.makedirs(outDir)
+            written = tablewrite.writeAtomically(job.outFilename, batchResult.content, tablewrite.isCompressedName(job.outFilename))
+            print("{}: {} transitions, {} missing actions -> {} ({})".format(job.glyphSet, batchResult.transitionCount, batchResult.missingCount,
+                                                                            job.outFilename, "written" if written else "unchanged"))
+            if cache is not None:
+                cache.merge(batchResult.cacheEntries)
+    except (ValueError, KeyError) as error:
+        print('{}: {}'.format(script_name, error), file=sys.stderr)
+        return 1
+    if cache is not None:
+        cache.save()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# -----------------------------------------------------------------------------
+#  Benchmarks for pymorph.py table generation, emission and playback
+# -----------------------------------------------------------------------------
+# For each benchmark (a glyph set and search setting) this measures:
+#
+#   generate  - seconds to compute every transition (best and median of --repeat runs)
+#   emit      - seconds to produce the spin2 source (-f spin) from the results (the same)
+#   sizes     - bytes of the spin2 source text, of the tables it assembles to
+#               (linked) and of the packed binary table
+#   playback  - frames and pixel writes when the tables are replayed (morphsim.py)
+#
+# Results can be saved as a JSON baseline (--save) and a later run compared to
+#  it (--compare): a timing whose best run is more than --tolerance percent (and
+#  timingFloorSeconds) slower than the median run of the baseline, or any size or
+#  frame count larger than the baseline, is reported as a regression and the
+#  script exits non-zero. Garbage collection is disabled while timing (as timeit
+#  does). Even so, timings of separate runs on a busy or virtual machine can
+#  differ by a third, hence the wide default tolerance.
+
+import gc
+import sys
+import json
+import random
+import statistics
+import platform
+import argparse
+from signal import signal, SIGPIPE, SIG_DFL
+from time import perf_counter
+from collections import OrderedDict, namedtuple
+
+import glyphsets
+import tablepack
+import tablewrite
+import pymorph
+import morphsim
+
+script_version = "0.1.0"
+script_name = 'morphbench.py'
+script_info = '{} v{}'.format(script_name, script_version)
+
+# version of the baseline file layout
+baselineVersion = 1
+
+# a benchmark: makeEngine() returns a fresh TransitionEngine
+Benchmark = namedtuple('Benchmark', ['name', 'makeEngine'])
+
+# metrics compared with a tolerance (seconds, as (best, median) pairs) and those which must not grow
+timingMetrics = [("generate_s", "generate_median_s"), ("emit_s", "emit_median_s")]
+sizeMetrics = ["spin_bytes", "linked_bytes", "packed_bytes", "max_frames", "total_frames", "peak_writes"]
+
+# timings differing by less than this are noise, never a regression
+timingFloorSeconds = 0.002
+
+def syntheticGlyphSet(name, geometry, glyphCount, seed=1):
+    # return glyph set of glyphCount distinct glyphs lighting random segments of a geometry
+    #  (every possible glyph when glyphCount covers them all)
+    segmentNames = geometry["segments"]
+    maskCount = 1 << len(segmentNames)
+    if glyphCount >= maskCount:
+        masks = list(range(maskCount))
+    else:
+        masks = sorted(random.Random(seed).sample(range(maskCount), glyphCount))
+    glyphs = []
+    for mask in masks:
+        segments = [segName for segIdx, segName in enumerate(segmentNames) if mask & (1 << (len(segmentNames) - 1 - segIdx))]
+        glyphs.append(("g{:X}".format(mask), " ".join(segments)))
+    return glyphsets.glyphSet(name, geometry, glyphs)
+
+def stockBenchmark(name, glyphSetName, search=None):
+    return Benchmark(name, lambda: pymorph.engineForGlyphSet(glyphsets.glyphSetDict[glyphSetName], search))
+
+def syntheticBenchmark(name, geometry, glyphCount):
+    glyphSet = syntheticGlyphSet(name, geometry, glyphCount)
+    return Benchmark(name, lambda: pymorph.engineForGlyphSet(glyphSet))
+
+# the benchmarks run by default
+benchmarkSet = [
+    Benchmark("digits", lambda: pymorph.TransitionEngine()),
+    Benchmark("digits-frames", lambda: pymorph.TransitionEngine(search="frames")),
+    stockBenchmark("hex", "hex"),
+    stockBenchmark("alnum16", "alnum16"),
+    syntheticBenchmark("all7seg", glyphsets.sevenSegmentGeometry, 128),
+    syntheticBenchmark("random16seg", glyphsets.sixteenSegmentGeometry, 200),
+]
+
+def timeRuns(function, repeat):
+    # return (best seconds, median seconds, last return value) of repeat calls of function
+    runSeconds = []
+    gcWasEnabled = gc.isenabled()
+    gc.disable()
+    try:
+        for runIdx in range(max(repeat, 1)):
+            startTime = perf_counter()
+            value = function()
+            runSeconds.append(perf_counter() - startTime)
+    finally:
+        if gcWasEnabled:
+            gc.enable()
+    return min(runSeconds), statistics.median(runSeconds), value
+
+def runBenchmark(benchmark, repeat, segmentLength):
+    # return OrderedDict of metrics for one benchmark
+    engine = benchmark.makeEngine()
+    # each run uses a fresh engine so no search results are reused
+    generateSeconds, generateMedian, results = timeRuns(lambda: list(benchmark.makeEngine().transitions()), repeat)
+    metrics = OrderedDict()
+    metrics["transitions"] = len(results)
+    metrics["generate_s"] = generateSeconds
+    metrics["generate_median_s"] = generateMedian
+    metrics["per_transition_us"] = 1e6 * generateSeconds / max(len(results), 1)
+    try:
+        pymorph.checkOutputFormat(engine.model, 'spin')
+        emitSeconds, emitMedian, spinText = timeRuns(lambda: pymorph.tableOutputFor(results, engine, 'spin'), repeat)
+        metrics["emit_s"] = emitSeconds
+        metrics["emit_median_s"] = emitMedian
+        metrics["spin_bytes"] = len(spinText.encode())
+    except ValueError:
+        # more segments than the spin2 source tables handle
+        metrics["emit_s"] = None
+        metrics["emit_median_s"] = None
+        metrics["spin_bytes"] = None
+    try:
+        packedTable = tablepack.packTransitions(results, len(engine.labels), engine.model.segmentCount)
+        metrics["linked_bytes"] = packedTable.stats.linkedBytes
+        metrics["packed_bytes"] = packedTable.stats.packedBytes
+    except ValueError:
+        # too large for WORD offsets
+        metrics["linked_bytes"] = None
+        metrics["packed_bytes"] = None
+    timings = [morphsim.simulateTransition(result, engine.model, segmentLength) for result in results]
+    metrics["max_frames"] = max([timing.frameCount for timing in timings] + [0])
+    metrics["total_frames"] = sum(timing.frameCount for timing in timings)
+    metrics["peak_writes"] = max([timing.peakWrites for timing in timings] + [0])
+    return metrics
+
+def regressionsFor(baseline, current, tolerancePercent):
+    # return list of regression descriptions of current vs. baseline benchmark results
+    #  a timing regresses when even its best run is slower than the median baseline run
+    regressions = []
+    for name, metrics in current.items():
+        if name not in baseline:
+            continue
+        baseMetrics = baseline[name]
+        for metric, medianMetric in timingMetrics:
+            baseValue = baseMetrics.get(medianMetric, baseMetrics.get(metric))
+            if baseValue and metrics[metric] is not None and metrics[metric] > baseValue * (1.0 + tolerancePercent / 100.0) and metrics[metric] - baseValue > timingFloorSeconds:
+                regressions.append("{} {}: {:.6f} vs baseline median {:.6f} (+{:.0f}%)".format(name, metric, metrics[metric], baseValue, 100.0 * (metrics[metric] - baseValue) / baseValue))
+        for metric in sizeMetrics:
+            baseValue = baseMetrics.get(metric)
+            if baseValue is not None and metrics[metric] is not None and metrics[metric] > baseValue:
+                regressions.append("{} {}: {} vs {}".format(name, metric, metrics[metric], baseValue))
+    return regressions
+
+def formatValue(value):
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return "{:.6f}".format(value) if value < 1.0 else "{:.3f}".format(value)
+    return str(value)
+
+# -----------------------------------------------------------------------------
+#  main application
+# -----------------------------------------------------------------------------
+def main(argv=None):
+    signal(SIGPIPE,SIG_DFL)
+
+    parser = argparse.ArgumentParser(description=script_info, epilog='For further details see: ' + pymorph.project_url)
+    parser.add_argument("-b", '--benchmark', help='benchmark to run (repeatable, default: all)', choices=[benchmark.name for benchmark in benchmarkSet], action='append', default=None)
+    parser.add_argument("-r", '--repeat', help='runs to time, the best and median are kept (default: 5)', type=int, default=5)
+    parser.add_argument("-l", '--segment_length', help='segment length used for playback (default: {})'.format(pymorph.defaultSegmentLength), type=pymorph.segmentLengthArg, default=pymorph.defaultSegmentLength)
+    parser.add_argument('--save', help='save the results as a JSON baseline file', default='')
+    parser.add_argument('--compare', help='compare the results with a JSON baseline file', default='')
+    parser.add_argument('--tolerance', help='percent a timing may be slower than the baseline (default: 50)', type=float, default=50.0)
+    parse_args = parser.parse_args(argv)
+
+    names = parse_args.benchmark
+    current = OrderedDict()
+    for benchmark in benchmarkSet:
+        if names is None or benchmark.name in names:
+            current[benchmark.name] = runBenchmark(benchmark, parse_args.repeat, parse_args.segment_length)
+
+    columns = list(current[next(iter(current))].keys())
+    print("{:<14} {}".format("benchmark", " ".join("{:>17}".format(column) for column in columns)))
+    for name, metrics in current.items():
+        print("{:<14} {}".format(name, " ".join("{:>17}".format(formatValue(metrics[column])) for column in columns)))
+
+    if len(parse_args.save) > 0:
+        baselineDict = OrderedDict([("version", baselineVersion), ("python", platform.python_version()), ("benchmarks", current)])
+        tablewrite.writeAtomically(parse_args.save, json.dumps(baselineDict, indent=2) + "\n")
+        print("Baseline saved to {}".format(parse_args.save))
+
+    if len(parse_args.compare) > 0:
+        with open(parse_args.compare) as baseline_fp:
+            baselineDict = json.load(baseline_fp)
+        if baselineDict.get("version") != baselineVersion:
+            print("{}: {} is not a version {} baseline".format(script_name, parse_args.compare, baselineVersion), file=sys.stderr)
+            return 1
+        regressions = regressionsFor(baselineDict["benchmarks"], current, parse_args.tolerance)
+        if len(regressions) > 0:
+            print("{} regression{} vs {}:".format(len(regressions), "" if len(regressions) == 1 else "s", parse_args.compare))
+            for regression in regressions:
+                print("  {}".format(regression))
+            return 2
+        print("No regressions vs {}".format(parse_args.compare))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+# -----------------------------------------------------------------------------
+#  Content-addressed cache of transition results for pymorph.py
+# -----------------------------------------------------------------------------
+# Each result is stored under a key naming everything it was computed from: the
+#  two glyph masks and the rules which could fire for each changing segment (see
+#  TransitionEngine.cacheKeyFor()). Editing one glyph only misses the pairs using
+#  that glyph and editing one rule only misses the pairs where it could fire, so
+#  one cache file can be shared by every font variant generated.
+#
+# The cache is a single JSON file of {key: [[[action fields...], ...], [missing...]]}
+#  which is rewritten atomically when results were added. A file (or an entry)
+#  of any other shape is treated as missing and its results are recomputed.
+
+import os
+import json
+
+import tablewrite
+
+class TransitionCache(object):
+    # results by cache key, loaded from and saved to a JSON file
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.entries = {}
+        # entries stored by this run (by key)
+        self.added = {}
+        self.hits = 0
+        self.misses = 0
+        if os.path.exists(filename):
+            with open(filename) as cache_fp:
+                try:
+                    self.entries = json.load(cache_fp)
+                except ValueError:
+                    # a damaged cache is rebuilt
+                    self.entries = {}
+            if not isinstance(self.entries, dict):
+                self.entries = {}
+
+    def get(self, key, actionType):
+        # return (actions, missing) stored under key (actions made with actionType), else None
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        try:
+            actionFields, missing = entry
+            cached = [actionType(*fields) for fields in actionFields], [str(segName) for segName in missing]
+        except (TypeError, ValueError):
+            # not an entry this version wrote, recomputed (and replaced)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return cached
+
+    def put(self, key, actions, missing):
+        # store (actions, missing) under key
+        entry = [[list(action) for action in actions], list(missing)]
+        self.entries[key] = entry
+        self.added[key] = entry
+
+    def merge(self, entries):
+        # add entries (e.g., the added entries of a cache used by another process)
+        for key, entry in entries.items():
+            if key not in self.entries:
+                self.entries[key] = entry
+                self.added[key] = entry
+
+    def save(self):
+        # write the cache file if results were added, return True if written
+        if len(self.added) == 0 and os.path.exists(self.filename):
+            return False
+        return tablewrite.writeAtomically(self.filename, json.dumps(self.entries, sort_keys=True, separators=(",", ":")))
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# -----------------------------------------------------------------------------
+#  Multi-digit counter sequence planner for the tables generated by pymorph.py
+# -----------------------------------------------------------------------------
+# Steps a digit group the way nextTimeCycle() of isp_hub75_morphCounters.spin2
+#  does (clock, up-counter or countdown) and, for each tick, schedules the digit
+#  transitions it causes. Every digit normally starts animating in the first
+#  frame so a rollover (e.g. 0959 -> 1000) changes all digits at once; with
+#  --max_delay each changing digit may start up to that many frames later,
+#  choosing the start frames which keep the most pixel writes in any one frame
+#  lowest.
+#
+# NOTE: as in the spin2 code a clock counts minutes from 0 to 1259 (hours are
+#  currValue / 60) and its digits show hours / 10, hours // 10, minutes / 10
+#  and minutes // 10.
+
+import sys
+import json
+import argparse
+from signal import signal, SIGPIPE, SIG_DFL
+from collections import OrderedDict, namedtuple
+
+import pymorph
+import morphsim
+
+script_version = "0.1.0"
+script_name = 'morphplan.py'
+script_info = '{} v{}'.format(script_name, script_version)
+
+# sequences a group can step through (see GRP_* in isp_hub75_morphCounters.spin2)
+sequenceSet = ["clock", "up", "down"]
+
+# last value of a clock (minutes)
+clockValueCap = 1259
+
+# one digit changing during a tick
+#   startFrame - frame (from 0) in which the digit's animation starts
+#   frameWrites, frameAnimations - pixel writes and segments animating in each frame of the digit's animation
+DigitChange = namedtuple('DigitChange', ['digitIdx', 'fmDigit', 'toDigit', 'startFrame', 'actions', 'frameWrites', 'frameAnimations'])
+
+# the plan for one tick of the sequence
+TickPlan = namedtuple('TickPlan', ['tick', 'fmValue', 'toValue', 'changes', 'frameCount', 'frameWrites', 'frameAnimations', 'peakWrites', 'peakAnimations'])
+
+def digitsForValue(sequence, value, digitCount):
+    # return list of digit values shown for a counter value (most significant first)
+    if sequence == "clock":
+        hours = value // 60
+        minutes = value % 60
+        return [hours // 10, hours % 10, minutes // 10, minutes % 10]
+    return [(value // (10 ** (digitCount - 1 - digitIdx))) % 10 for digitIdx in range(digitCount)]
+
+def nextValue(sequence, value, digitCount):
+    # return the counter value after one nextTimeCycle()
+    if sequence == "clock":
+        return 0 if value + 1 > clockValueCap else value + 1
+    valueCap = (10 ** digitCount) - 1
+    if sequence == "up":
+        return 0 if value + 1 > valueCap else value + 1
+    return valueCap if value - 1 < 0 else value - 1
+
+def valueLabel(sequence, value, digitCount):
+    digits = "".join(str(digit) for digit in digitsForValue(sequence, value, digitCount))
+    return "{}:{}".format(digits[:2], digits[2:]) if sequence == "clock" else digits
+
+class SequencePlanner(object):
+    # plans the ticks of a counter sequence for a digit group
+
+    def __init__(self, engine, segmentLength, maxDelay=0, segmentWidth=1):
+        # engine: TransitionEngine of the digits 0-9
+        # segmentLength, segmentWidth: segment length and width (pixels) of the group
+        # maxDelay: most frames a digit's start may be delayed to spread the load
+        self.engine = engine
+        self.segmentLength = segmentLength
+        self.segmentWidth = segmentWidth
+        self.maxDelay = maxDelay
+        # (writes per frame, animations per frame, actions) by (fmDigit, toDigit)
+        self.pairLoads = {}
+
+    def pairLoad(self, fmDigit, toDigit):
+        # return (frameWrites, frameAnimations, actions) for one digit changing
+        pairKey = (fmDigit, toDigit)
+        if pairKey not in self.pairLoads:
+            result = self.engine.calcSegDiffs(fmDigit, toDigit)
+            timing = morphsim.simulateTransition(result, self.engine.model, self.segmentLength, self.segmentWidth)
+            frameAnimations = [0] * timing.frameCount
+            for action in result.actions:
+                for frameIdx in range(pymorph.animationStepsFor(action.style, self.segmentLength)):
+                    frameAnimations[frameIdx] += 1
+            self.pairLoads[pairKey] = (timing.frameWrites, frameAnimations, result.actions)
+        return self.pairLoads[pairKey]
+
+    def planTick(self, tick, fmValue, toValue, fmDigits, toDigits):
+        # return TickPlan for the digits changing from fmDigits to toDigits
+        changing = []
+        for digitIdx, (fmDigit, toDigit) in enumerate(zip(fmDigits, toDigits)):
+            if fmDigit != toDigit:
+                frameWrites, frameAnimations, actions = self.pairLoad(fmDigit, toDigit)
+                changing.append((digitIdx, fmDigit, toDigit, actions, frameWrites, frameAnimations))
+
+        # busiest digits are placed first, each at the start frame giving the lowest peak
+        #  (then the fewest frames, then the earliest start)
+        frameWrites = []
+        startFrames = {}
+        for digitIdx, fmDigit, toDigit, actions, digitWrites, digitAnimations in sorted(changing, key=lambda change: (-max(change[4] + [0]), change[0])):
+            bestChoice = None
+            for startFrame in range(self.maxDelay + 1):
+                combined = addLoad(frameWrites, digitWrites, startFrame)
+                choice = (max(combined + [0]), len(combined), startFrame)
+                if bestChoice is None or choice < bestChoice:
+                    bestChoice = choice
+            startFrames[digitIdx] = bestChoice[2]
+            frameWrites = addLoad(frameWrites, digitWrites, bestChoice[2])
+
+        changes = []
+        frameAnimations = []
+        for digitIdx, fmDigit, toDigit, actions, digitWrites, digitAnimations in changing:
+            startFrame = startFrames[digitIdx]
+            frameAnimations = addLoad(frameAnimations, digitAnimations, startFrame)
+            changes.append(DigitChange(digitIdx, fmDigit, toDigit, startFrame, actions, digitWrites, digitAnimations))
+        return TickPlan(tick, fmValue, toValue, changes, len(frameWrites), frameWrites, frameAnimations, max(frameWrites + [0]), max(frameAnimations + [0]))
+
+    def planSequence(self, sequence, digitCount, startValue, tickCount):
+        # generate TickPlan for each of tickCount ticks starting from startValue
+        value = startValue
+        for tick in range(tickCount):
+            toValue = nextValue(sequence, value, digitCount)
+            yield self.planTick(tick, value, toValue, digitsForValue(sequence, value, digitCount), digitsForValue(sequence, toValue, digitCount))
+            value = toValue
+
+def addLoad(frameLoad, digitLoad, startFrame):
+    # return per frame load with digitLoad added starting at startFrame
+    combined = list(frameLoad) + [0] * max(0, startFrame + len(digitLoad) - len(frameLoad))
+    for frameIdx, load in enumerate(digitLoad):
+        combined[startFrame + frameIdx] += load
+    return combined
+
+def scheduleFor(plan, sequence, digitCount):
+    # return JSON-ready dict of one tick's schedule
+    changes = [OrderedDict([("digit", change.digitIdx), ("fm", change.fmDigit), ("to", change.toDigit), ("startFrame", change.startFrame),
+                            ("actions", [action.code for action in change.actions])]) for change in plan.changes]
+    return OrderedDict([("tick", plan.tick), ("fm", valueLabel(sequence, plan.fmValue, digitCount)), ("to", valueLabel(sequence, plan.toValue, digitCount)),
+                        ("frames", plan.frameCount), ("peakWrites", plan.peakWrites), ("peakAnimations", plan.peakAnimations), ("changes", changes)])
+
+# -----------------------------------------------------------------------------
+#  main application
+# -----------------------------------------------------------------------------
+def main(argv=None):
+    signal(SIGPIPE,SIG_DFL)
+
+    parser = argparse.ArgumentParser(description=script_info, epilog='For further details see: ' + pymorph.project_url)
+    parser.add_argument('sequence', help='how the group counts', choices=sequenceSet)
+    parser.add_argument("-n", '--digits', help='digits in the group (default: 4, a clock always has 4)', type=int, default=4)
+    parser.add_argument('--start', help='initial counter value (default: 0)', type=int, default=0)
+    parser.add_argument('--ticks', help='ticks to plan (default: one full cycle)', type=int, default=0)
+    parser.add_argument("-l", '--segment_length', help='segment length in pixels (default: {})'.format(pymorph.defaultSegmentLength), type=pymorph.segmentLengthArg, default=pymorph.defaultSegmentLength)
+    parser.add_argument("-w", '--segment_width', help='segment width in pixels (default: 1)', type=pymorph.segmentWidthArg, default=1)
+    parser.add_argument("-s", '--search', help='generate tables using a search objective', choices=pymorph.searchObjectiveSet, default=None)
+    parser.add_argument("-m", '--max_delay', help='frames a digit may start late to lower the peak load (default: 0, all digits start together)', type=int, default=0)
+    parser.add_argument('--worst', help='number of busiest ticks to list (default: 5)', type=int, default=5)
+    parser.add_argument("-o", '--out_filename', help='write the schedule of every tick to this JSON file', default='')
+    parse_args = parser.parse_args(argv)
+
+    sequence = parse_args.sequence
+    digitCount = 4 if sequence == "clock" else parse_args.digits
+    cycleLength = clockValueCap + 1 if sequence == "clock" else 10 ** digitCount
+    tickCount = parse_args.ticks if parse_args.ticks > 0 else cycleLength
+    if parse_args.start < 0 or parse_args.start >= cycleLength:
+        print('{}: start value must be from 0 to {}'.format(script_name, cycleLength - 1), file=sys.stderr)
+        return 1
+
+    engine = pymorph.TransitionEngine(search=parse_args.search, segmentLength=parse_args.segment_length, segmentWidth=parse_args.segment_width)
+    planner = SequencePlanner(engine, parse_args.segment_length, parse_args.max_delay, parse_args.segment_width)
+    plans = list(planner.planSequence(sequence, digitCount, parse_args.start, tickCount))
+    label = lambda value: valueLabel(sequence, value, digitCount)
+
+    print("{} ticks of a {}-digit {} (segment length {}, width {}, start delay up to {} frames)".format(tickCount, digitCount, sequence, parse_args.segment_length, parse_args.segment_width, parse_args.max_delay))
+    print("  frames/tick: max {}, pixel writes/frame: peak {}, segment animations/frame: peak {}".format(
+        max(plan.frameCount for plan in plans), max(plan.peakWrites for plan in plans), max(plan.peakAnimations for plan in plans)))
+    print("Busiest ticks:")
+    for plan in sorted(plans, key=lambda plan: (-plan.peakWrites, -plan.peakAnimations, plan.tick))[:parse_args.worst]:
+        starts = ", ".join("d{}:{}->{}@{}".format(change.digitIdx, change.fmDigit, change.toDigit, change.startFrame) for change in plan.changes)
+        print("  {} -> {}: {} frames, peak {} writes, {} animations {} [{}]".format(label(plan.fmValue), label(plan.toValue), plan.frameCount,
+                                                                             plan.peakWrites, plan.peakAnimations, plan.frameWrites, starts))
+
+    if len(parse_args.out_filename) > 0:
+        with open(parse_args.out_filename, "w") as out_fp:
+            json.dump([scheduleFor(plan, sequence, digitCount) for plan in plans], out_fp, indent=1)
+        print("Schedule written to {}".format(parse_args.out_filename))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
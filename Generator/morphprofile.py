@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+
+# -----------------------------------------------------------------------------
+#  Rule hit counters and phase timing for pymorph.py (-p / --profile_filename)
+# -----------------------------------------------------------------------------
+# Counts how often each kind of rule chose a segment's action (snake towards or
+#  away from a segment in a given state, column slide left or right, the
+#  fallback when none fits) and how many changing segments were left without one, split by
+#  segments turning ON and OFF. Also times the phases of a run:
+#
+#   classification - sorting the segments of each transition into turning ON/OFF,
+#                    staying ON and staying OFF
+#   matching       - finding the rule which fits each changing segment
+#   generation     - the rest of computing the transitions (cache lookups, results)
+#   reporting      - console messages and the -t trace
+#   emission       - formatting the table output
+#   packing        - building the packed table (-f dat or bin)
+#   writing        - writing the output file
+#
+# Phase times are exclusive: time spent in a phase timed within another is only
+#  counted once, in the inner phase.
+
+from time import perf_counter
+from collections import OrderedDict
+
+# version of the JSON layout written by asDict()
+profileVersion = 1
+
+phaseNameSet = ["classification", "matching", "generation", "reporting", "emission", "packing", "writing"]
+
+# command column names of the rule counts
+commandNameSet = ["CMD_TURN_ON", "CMD_TURN_OFF"]
+
+def ruleNameFor(action):
+    # return the name rule hits of a SegmentAction are counted under
+    if action.heading == "slides":
+        return "column slide {}".format("left" if action.style == "CMD_COL_TO_LT" else "right")
+    if action.heading == "fallback":
+        return "fallback (no rule fits)"
+    return "snake {} segment {}".format(action.heading, action.relation)
+
+class GeneratorProfile(object):
+    # rule hit counters and phase times of one pymorph.py run
+
+    def __init__(self):
+        # {rule name: {command: hits}} in the order rules were first seen
+        self.ruleCounts = OrderedDict()
+        self.transitionCount = 0
+        self.phaseSeconds = OrderedDict((phase, 0.0) for phase in phaseNameSet)
+        # time spent in inner phases by each phase being timed (innermost last)
+        self.openPhases = []
+        self.startTime = perf_counter()
+
+    def countHit(self, ruleName, command):
+        commandCounts = self.ruleCounts.get(ruleName)
+        if commandCounts is None:
+            commandCounts = self.ruleCounts[ruleName] = OrderedDict((commandName, 0) for commandName in commandNameSet)
+        commandCounts[command] += 1
+
+    def countResult(self, result, model):
+        # count the rules which chose the actions of one TransitionResult (and its missing segments)
+        self.transitionCount += 1
+        for action in result.actions:
+            self.countHit(ruleNameFor(action), action.command)
+        for segName in result.missing:
+            turningOn = result.toMask & model.bitTable[model.indexByName[segName]]
+            self.countHit("missing", "CMD_TURN_ON" if turningOn else "CMD_TURN_OFF")
+
+    def addPhaseTime(self, phase, seconds, innerSeconds=0.0):
+        # record seconds spent in phase, innerSeconds of which were recorded by inner phases
+        self.phaseSeconds[phase] += seconds - innerSeconds
+        if len(self.openPhases) > 0:
+            self.openPhases[-1] += seconds
+
+    def timeCall(self, phase, function, *args):
+        # return function(*args), adding the time it takes to phase
+        self.openPhases.append(0.0)
+        startTime = perf_counter()
+        try:
+            return function(*args)
+        finally:
+            seconds = perf_counter() - startTime
+            self.addPhaseTime(phase, seconds, self.openPhases.pop())
+
+    def timedItems(self, iterable, phase):
+        # generate the items of iterable, adding the time taken to make each to phase
+        iterator = iter(iterable)
+        while True:
+            self.openPhases.append(0.0)
+            startTime = perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                seconds = perf_counter() - startTime
+                self.addPhaseTime(phase, seconds, self.openPhases.pop())
+            yield item
+
+    def totalSeconds(self):
+        return perf_counter() - self.startTime
+
+    def asDict(self):
+        # return JSON-ready dict of the counters and phase times
+        return OrderedDict([
+            ("version", profileVersion),
+            ("transitions", self.transitionCount),
+            ("rules", self.ruleCounts),
+            ("phaseSeconds", self.phaseSeconds),
+            ("totalSeconds", self.totalSeconds()),
+        ])
+
+    def reportLines(self):
+        # return lines of the rule hit and phase time summary tables
+        lines = []
+        lines.append("{:<40} {:>8} {:>8} {:>8} {:>6}".format("rule ({} transitions)".format(self.transitionCount), "ON", "OFF", "total", "%"))
+        allHits = sum(sum(commandCounts.values()) for commandCounts in self.ruleCounts.values())
+        # percentages of nothing (no actions chosen, no time measured) are shown as 0
+        percentOf = lambda part, whole: 100.0 * part / whole if whole > 0 else 0.0
+        for ruleName, commandCounts in sorted(self.ruleCounts.items(), key=lambda item: -sum(item[1].values())):
+            hits = sum(commandCounts.values())
+            lines.append("{:<40} {:>8} {:>8} {:>8} {:>6.1f}".format(ruleName, commandCounts["CMD_TURN_ON"], commandCounts["CMD_TURN_OFF"], hits, percentOf(hits, allHits)))
+        totalSeconds = self.totalSeconds()
+        lines.append("{:<40} {:>10} {:>6}".format("phase", "ms", "%"))
+        for phase, seconds in self.phaseSeconds.items():
+            lines.append("{:<40} {:>10.2f} {:>6.1f}".format(phase, 1000.0 * seconds, percentOf(seconds, totalSeconds)))
+        lines.append("{:<40} {:>10.2f}".format("total", 1000.0 * totalSeconds))
+        return lines
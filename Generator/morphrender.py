@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# -----------------------------------------------------------------------------
+#  Offline HUB75 panel renderer for the tables generated by pymorph.py
+# -----------------------------------------------------------------------------
+# Renders morphing seven segment digits the way isp_hub75_morph7seg.spin2 places
+#  them and isp_hub75_morphSegment.spin2 draws them, producing one RGB frame per
+#  animateStep(). Rather than drawing pixel by pixel (as drawLine() does) every
+#  frame of every segment of every digit is computed at once with NumPy.
+#
+# Frame 0 shows the digits before the change, frame 1 is the update made when
+#  the digits are commanded to change and each later frame is one animateStep().
+#  Segments keep showing what their last update drew once their animation is done.
+#
+# Requires NumPy. Writing .gif files also requires Pillow.
+
+import os
+import sys
+import zlib
+import struct
+import argparse
+from signal import signal, SIGPIPE, SIG_DFL
+from collections import namedtuple
+
+import numpy as np
+
+import pymorph
+
+script_version = "0.1.0"
+script_name = 'morphrender.py'
+script_info = '{} v{}'.format(script_name, script_version)
+
+# size of one HUB75 panel
+panelColumns = 64
+panelRows = 32
+
+# a digit placed on the panel (see placeDigit() in isp_hub75_morph7seg.spin2)
+DigitPlacement = namedtuple('DigitPlacement', ['row', 'column', 'segmentLength', 'rgbColor'])
+
+# where each segment starts relative to the digit's top-left, for segment length L
+#  (row offset, column offset, is horizontal) as in initialSetup() of isp_hub75_morph7seg.spin2
+segmentOffsetDict = {
+    "a": lambda L: (0, 1, True),
+    "b": lambda L: (1, L + 1, False),
+    "c": lambda L: (L + 2, L + 1, False),
+    "d": lambda L: ((2 * L) + 2, 1, True),
+    "e": lambda L: (L + 2, 0, False),
+    "f": lambda L: (1, 0, False),
+    "g": lambda L: (L + 1, 1, True),
+}
+
+# style kinds used when computing lit pixels
+KIND_STATIC = 0         # segment not changing
+KIND_SNAKE_START = 1    # snake growing/shrinking at its left/top end
+KIND_SNAKE_END = 2      # snake growing/shrinking at its right/bottom end
+KIND_IMMEDIATE = 3
+KIND_COL_TO_LT = 4
+KIND_COL_TO_RT = 5
+
+styleKindDict = {
+    "CMD_LT_TO_RT": KIND_SNAKE_START,
+    "CMD_TOP_DOWN": KIND_SNAKE_START,
+    "CMD_RT_TO_LT": KIND_SNAKE_END,
+    "CMD_BOTTOM_UP": KIND_SNAKE_END,
+    "CMD_IMMEDIATE": KIND_IMMEDIATE,
+    "CMD_COL_TO_LT": KIND_COL_TO_LT,
+    "CMD_COL_TO_RT": KIND_COL_TO_RT,
+}
+
+def groupPlacements(row, column, digitCount, segmentLength, rgbColor, isClock=False):
+    # return DigitPlacements for a group as placed by placeDigitGroup() of isp_hub75_morphCounters.spin2
+    digitWidth = segmentLength + 2
+    digitHspace = 4 if segmentLength > 7 else 1
+    placements = []
+    currColumn = column
+    for digitIdx in range(digitCount):
+        placements.append(DigitPlacement(row, currColumn, segmentLength, rgbColor))
+        currColumn += digitWidth + digitHspace
+        if isClock and digitIdx == 1:
+            currColumn += 2 + 1     # room for the dots
+    return placements
+
+class MorphRenderer(object):
+    # renders transitions of a row of placed seven segment digits
+
+    def __init__(self, engine, placements, columns=panelColumns, rows=panelRows):
+        # engine: TransitionEngine (seven segment) providing the transitions
+        # placements: list of DigitPlacement, one per digit
+        model = engine.model
+        if sorted(model.segmentNames) != sorted(segmentOffsetDict):
+            raise ValueError("Only seven segment (a-g) glyph sets can be rendered")
+        # a digit is L + 2 pixels wide and 2L + 3 high (see segmentOffsetDict), drawLine() would clip the rest
+        rightEdge = max(placement.column + placement.segmentLength + 2 for placement in placements)
+        bottomEdge = max(placement.row + (2 * placement.segmentLength) + 3 for placement in placements)
+        if rightEdge > columns or bottomEdge > rows:
+            raise ValueError("The digits need {}x{} pixels, the panel{} {}x{}".format(rightEdge, bottomEdge, "s are" if columns > panelColumns else " is", columns, rows))
+        self.engine = engine
+        self.placements = placements
+        self.columns = columns
+        self.rows = rows
+        segmentCount = model.segmentCount
+        self.segmentCount = segmentCount
+        maxLength = max(placement.segmentLength for placement in placements)
+
+        # candidate pixels of each segment: position along it (t) and column offset (c)
+        #  only the sliding segments use c > 0 (up to L, as COL_TO_RT can draw there)
+        tValues, cValues = np.meshgrid(np.arange(maxLength), np.arange(maxLength + 1), indexing='ij')
+        self.tValues = tValues.ravel()
+        self.cValues = cValues.ravel()
+
+        # per segment (all digits, digit major) geometry
+        segRows = []
+        segColumns = []
+        isHorizontal = []
+        lengths = []
+        colors = []
+        for placement in placements:
+            for segName in model.segmentNames:
+                rowOffset, columnOffset, horizontal = segmentOffsetDict[segName](placement.segmentLength)
+                segRows.append(placement.row + rowOffset)
+                segColumns.append(placement.column + columnOffset)
+                isHorizontal.append(horizontal)
+                lengths.append(placement.segmentLength)
+                colors.append(placement.rgbColor)
+        self.isColumn = np.array([model.sourceTable[segIdx] is not None for segIdx in range(segmentCount)] * len(placements))
+        self.lengths = np.array(lengths)
+        self.colors = np.array(colors, dtype=np.uint8)
+        segRows = np.array(segRows)[:, None]
+        segColumns = np.array(segColumns)[:, None]
+        horizontal = np.array(isHorizontal)[:, None]
+        tt = self.tValues[None, :]
+        cc = self.cValues[None, :]
+        pixelRows = np.where(horizontal, segRows, segRows + tt)
+        pixelColumns = np.where(horizontal, segColumns + tt, segColumns + cc)
+        self.valid = (tt < self.lengths[:, None]) & ((cc == 0) | (self.isColumn[:, None] & (cc <= self.lengths[:, None])))
+        self.valid &= (pixelRows >= 0) & (pixelRows < rows) & (pixelColumns >= 0) & (pixelColumns < columns)
+        self.pixelIndex = np.where(self.valid, pixelRows * columns + pixelColumns, 0)
+
+    def renderTransition(self, fmValues, toValues):
+        # return uint8 array (frames, rows, columns, 3) morphing each digit from fmValues[n] to toValues[n]
+        #  values are glyph indexes (None when the digit is hidden)
+        if len(fmValues) != len(self.placements) or len(toValues) != len(self.placements):
+            raise ValueError("Expected {} digit values, not {} -> {}".format(len(self.placements), len(fmValues), len(toValues)))
+        engine = self.engine
+        model = engine.model
+        segmentTotal = len(self.lengths)
+        kinds = np.zeros(segmentTotal, dtype=np.int8)
+        turningOn = np.zeros(segmentTotal, dtype=bool)
+        initialOn = np.zeros(segmentTotal, dtype=bool)
+        steps = np.zeros(segmentTotal, dtype=np.int32)
+        for digitIdx, (fmValue, toValue) in enumerate(zip(fmValues, toValues)):
+            firstSegIdx = digitIdx * self.segmentCount
+            fmMask = 0 if fmValue is None else engine.digitMaskSet[fmValue]
+            for segIdx, bit in enumerate(model.bitTable):
+                initialOn[firstSegIdx + segIdx] = (fmMask & bit) != 0
+            if fmValue is None or toValue is None or fmValue == toValue:
+                continue
+            result = engine.calcSegDiffs(fmValue, toValue)
+            segmentLength = self.placements[digitIdx].segmentLength
+            for action in result.actions:
+                segmentIdx = firstSegIdx + model.indexByName[action.segment]
+                kinds[segmentIdx] = styleKindDict[action.style]
+                turningOn[segmentIdx] = action.command == "CMD_TURN_ON"
+                steps[segmentIdx] = pymorph.animationStepsFor(action.style, segmentLength)
+
+        frameCount = int(steps.max()) + 1
+        # update number each segment is at in each frame (S, F, 1), held once complete
+        updates = np.minimum(np.arange(frameCount)[None, :], steps[:, None])[:, :, None]
+        lengths = self.lengths[:, None, None]
+        tt = self.tValues[None, None, :]
+        cc = self.cValues[None, None, :]
+        kind = kinds[:, None, None]
+        isOn = turningOn[:, None, None]
+        onLine = cc == 0
+
+        snakeStart = np.where(isOn, tt < updates, tt >= updates)
+        snakeEnd = np.where(isOn, tt >= lengths - updates, tt < lengths - updates)
+        columnOffset = np.where(kind == KIND_COL_TO_LT, lengths - updates - 1, updates + 1)
+        columnLit = np.where(isOn, cc == columnOffset, ((cc == columnOffset) | ((kind == KIND_COL_TO_RT) & (cc == columnOffset - 1))) & (lengths - updates - 1 > 0))
+        lit = np.select(
+            [(kind == KIND_STATIC) | (updates == 0), kind == KIND_SNAKE_START, kind == KIND_SNAKE_END, kind == KIND_IMMEDIATE],
+            [onLine & initialOn[:, None, None], onLine & snakeStart, onLine & snakeEnd, onLine],
+            default=columnLit)
+        lit &= self.valid[:, None, :]
+
+        frames = np.zeros((frameCount, self.rows * self.columns, 3), dtype=np.uint8)
+        segmentIdx, frameIdx, pixelIdx = np.nonzero(lit)
+        frames[frameIdx, self.pixelIndex[segmentIdx, pixelIdx]] = self.colors[segmentIdx]
+        return frames.reshape(frameCount, self.rows, self.columns, 3)
+
+    def renderSequence(self, valueList):
+        # generate frames for each change of a sequence of digit value lists
+        #  (each holding one value per placed digit)
+        for values in valueList:
+            if len(values) != len(self.placements):
+                raise ValueError("Expected {} digit values, not {}".format(len(self.placements), len(values)))
+        for fmValues, toValues in zip(valueList, valueList[1:]):
+            yield self.renderTransition(fmValues, toValues)
+
+# -----------------------------------------------------------------------------
+#  Writing frames
+# -----------------------------------------------------------------------------
+def pngBytes(frame):
+    # return PNG file content for an RGB frame (rows, columns, 3)
+    def chunk(chunkType, data):
+        return struct.pack(">I", len(data)) + chunkType + data + struct.pack(">I", zlib.crc32(chunkType + data) & 0xFFFFFFFF)
+    rows, columns = frame.shape[0], frame.shape[1]
+    scanLines = np.concatenate([np.zeros((rows, 1), dtype=np.uint8), frame.reshape(rows, columns * 3)], axis=1)
+    header = struct.pack(">IIBBBBB", columns, rows, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(scanLines.tobytes())) + chunk(b"IEND", b"")
+
+def scaledFrames(frames, scale):
+    # return frames with each pixel enlarged to scale x scale
+    if scale <= 1:
+        return frames
+    return frames.repeat(scale, axis=1).repeat(scale, axis=2)
+
+def writeFrames(frameChunks, out_filename, out_format, scale=1, frameMs=40):
+    # write frames (an iterable of frame arrays) as raw RGB, numbered PNG files or a GIF
+    #  returns the number of frames written
+    frameTotal = 0
+    if out_format == 'raw':
+        out_fp = sys.stdout.buffer if out_filename == '-' else open(out_filename, "wb")
+        try:
+            for frames in frameChunks:
+                out_fp.write(frames.tobytes())
+                frameTotal += len(frames)
+        finally:
+            if out_fp is not sys.stdout.buffer:
+                out_fp.close()
+    elif out_format == 'png':
+        if not os.path.isdir(out_filename):
+            os.makedirs(out_filename)
+        for frames in frameChunks:
+            for frame in scaledFrames(frames, scale):
+                with open(os.path.join(out_filename, "frame_{:05d}.png".format(frameTotal)), "wb") as png_fp:
+                    png_fp.write(pngBytes(frame))
+                frameTotal += 1
+    else:
+        try:
+            from PIL import Image
+        except ImportError:
+            raise ValueError("Writing .gif files requires Pillow (pip install Pillow)")
+        images = []
+        for frames in frameChunks:
+            images.extend(Image.fromarray(frame) for frame in scaledFrames(frames, scale))
+        if len(images) > 0:
+            images[0].save(out_filename, save_all=True, append_images=images[1:], duration=frameMs, loop=0)
+        frameTotal = len(images)
+    return frameTotal
+
+def parseColor(text):
+    # return (r, g, b) from "RRGGBB"
+    try:
+        value = int(text.lstrip("#$"), 16)
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected RRGGBB not [{}]".format(text))
+    return ((value >> 16) & 0xFF, (value >> 8) & 0xFF, value & 0xFF)
+
+# -----------------------------------------------------------------------------
+#  main application
+# -----------------------------------------------------------------------------
+def main(argv=None):
+    signal(SIGPIPE,SIG_DFL)
+
+    parser = argparse.ArgumentParser(description=script_info, epilog='For further details see: ' + pymorph.project_url)
+    parser.add_argument("-o", '--out_filename', help='file (raw, gif) or directory (png) to write, - for raw to stdout', required=True)
+    parser.add_argument("-f", '--out_format', help='raw RGB frames, numbered png files or an animated gif', choices=['raw', 'png', 'gif'], default='raw')
+    parser.add_argument("-g", '--glyph_set', help='seven segment glyph set to render (default: stock digits)', default='')
+    parser.add_argument("-s", '--search', help='generate tables using a search objective', choices=pymorph.searchObjectiveSet, default=None)
+    parser.add_argument("-l", '--segment_length', help='segment length in pixels (default: {})'.format(pymorph.defaultSegmentLength), type=pymorph.segmentLengthArg, default=pymorph.defaultSegmentLength)
+    parser.add_argument("-w", '--segment_width', help='segment width (pixels) the tables are searched for, segments are drawn one line wide as drawLine() draws them (default: 1)', type=pymorph.segmentWidthArg, default=1)
+    parser.add_argument('--values', help='comma separated values to show in turn (e.g., 0959,1000), default: every glyph to glyph transition on one digit', default='')
+    parser.add_argument('--clock', help='place the digits as a clock group (room for the dots after the second of 4 digits)', action="store_true")
+    parser.add_argument('--chain', help='number of panels chained left to right (default: 1)', type=int, default=1)
+    parser.add_argument('--color', help='digit color as RRGGBB (default: FF8000)', type=parseColor, default=(0xFF, 0x80, 0x00))
+    parser.add_argument('--scale', help='enlarge pixels of png/gif output (default: 4)', type=int, default=4)
+    parse_args = parser.parse_args(argv)
+
+    try:
+        if len(parse_args.glyph_set) > 0:
+            engine = pymorph.engineForGlyphSet(pymorph.loadGlyphSet(parse_args.glyph_set), parse_args.search, parse_args.segment_length, segmentWidth=parse_args.segment_width)
+        else:
+            engine = pymorph.TransitionEngine(search=parse_args.search, segmentLength=parse_args.segment_length, segmentWidth=parse_args.segment_width)
+        labelIndex = dict((label, glyphIdx) for glyphIdx, label in enumerate(engine.labels))
+        if len(parse_args.values) > 0:
+            valueList = []
+            for value in parse_args.values.split(","):
+                unknownLabels = [label for label in value if label not in labelIndex]
+                if len(unknownLabels) > 0:
+                    raise ValueError("Unknown glyph(s) {} in value [{}]".format(unknownLabels, value))
+                valueList.append([labelIndex[label] for label in value])
+            if len(valueList) < 2:
+                raise ValueError("At least two values are needed to show a transition: {}".format(parse_args.values))
+            if len(set(len(values) for values in valueList)) > 1:
+                raise ValueError("Values must all have the same number of digits: {}".format(parse_args.values))
+        else:
+            # every transition, one after the other
+            glyphCount = len(engine.labels)
+            valueList = []
+            for fmGlyph in range(glyphCount):
+                for toGlyph in range(glyphCount):
+                    if fmGlyph != toGlyph:
+                        valueList.extend([[fmGlyph], [toGlyph]])
+            if len(valueList) == 0:
+                raise ValueError("The glyph set has no transitions to render")
+        if parse_args.clock and len(valueList[0]) != 4:
+            raise ValueError("A clock has 4 digits, not {}".format(len(valueList[0])))
+        placements = groupPlacements(1, 1, len(valueList[0]), parse_args.segment_length, parse_args.color, parse_args.clock)
+        renderer = MorphRenderer(engine, placements, panelColumns * parse_args.chain, panelRows)
+        if len(parse_args.values) > 0:
+            frameChunks = renderer.renderSequence(valueList)
+        else:
+            frameChunks = (renderer.renderTransition(valueList[pairIdx], valueList[pairIdx + 1]) for pairIdx in range(0, len(valueList), 2))
+        frameTotal = writeFrames(frameChunks, parse_args.out_filename, parse_args.out_format, parse_args.scale)
+    except (ValueError, KeyError) as error:
+        print('{}: {}'.format(script_name, error), file=sys.stderr)
+        return 1
+    print('{} frames of {}x{} written to {}'.format(frameTotal, panelColumns * parse_args.chain, panelRows, parse_args.out_filename), file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# -----------------------------------------------------------------------------
+#  Animation timing simulator for the tables generated by pymorph.py
+# -----------------------------------------------------------------------------
+# Replays each transition the way isp_hub75_morphSegment.spin2 animates it:
+#  commandSegment() does the first update, then each animateStep() does one
+#  more until the segment's step count runs out. Every update clears the
+#  segment and redraws the pixels still lit, so we count those drawPixel calls.
+#
+# Frame 1 is the update made when the digit is commanded to change.
+
+import sys
+import argparse
+from signal import signal, SIGPIPE, SIG_DFL
+from collections import namedtuple
+
+import pymorph
+
+script_version = "0.1.0"
+script_name = 'morphsim.py'
+script_info = '{} v{}'.format(script_name, script_version)
+
+# a group of digits as placed by placeDigitGroup(row, column, grpType, nbrDigits, segThickness, segLength, ...)
+DigitGroup = namedtuple('DigitGroup', ['digitCount', 'segmentWidth', 'segmentLength'])
+
+# the groups placed by isp_hub75_demoMorphSeg.spin2
+demoLayout = [DigitGroup(4, 1, 6), DigitGroup(4, 1, 6), DigitGroup(3, 1, 15), DigitGroup(4, 1, 9)]
+
+# timing of one transition
+#   frameWrites - pixel writes in each frame (frame 1 first)
+TransitionTiming = namedtuple('TransitionTiming', ['fmDigit', 'toDigit', 'frameCount', 'frameWrites', 'totalWrites', 'peakWrites'])
+
+def simulateTransition(result, model, segmentLength, segmentWidth=1):
+    # return TransitionTiming for one TransitionResult on segments of segmentLength x segmentWidth pixels
+    frameWrites = []
+    for action in result.actions:
+        isColumnSegment = model.sourceTable[model.indexByName[action.segment]] is not None
+        frameWrites = pymorph.addFrameWrites(frameWrites, pymorph.actionFrameWrites(isColumnSegment, action.command, action.style, segmentLength, segmentWidth))
+    return TransitionTiming(result.fmDigit, result.toDigit, len(frameWrites), frameWrites, sum(frameWrites), max(frameWrites + [0]))
+
+def simulateTable(engine, segmentLength, segmentWidth=1):
+    # return list of TransitionTiming for every transition the engine generates
+    return [simulateTransition(result, engine.model, segmentLength, segmentWidth) for result in engine.transitions()]
+
+def worstTransitions(timings, count):
+    # return the count slowest transitions (most frames, then most pixel writes in a frame)
+    return sorted(timings, key=lambda timing: (-timing.frameCount, -timing.peakWrites, timing.fmDigit, timing.toDigit))[:count]
+
+def groupEngine(engine, group):
+    # return engine generating the glyphs of engine (with its search) for the segments of a group
+    #  (a search's choices depend on the segment length and width)
+    if group.segmentLength == engine.segmentLength and group.segmentWidth == engine.segmentWidth:
+        return engine
+    return pymorph.TransitionEngine(engine.digitSet, engine.model, engine.labels, engine.search, group.segmentLength, segmentWidth=group.segmentWidth)
+
+def layoutWorstCase(layout, engine):
+    # return (frameCount, peakWrites) if every digit of every group changes at once
+    #  using each group's slowest transition and its busiest frame
+    frameCount = 0
+    peakWrites = 0
+    # timings by (segment length, segment width)
+    groupTimings = {}
+    for group in layout:
+        groupKey = (group.segmentLength, group.segmentWidth)
+        if groupKey not in groupTimings:
+            groupTimings[groupKey] = simulateTable(groupEngine(engine, group), group.segmentLength, group.segmentWidth)
+        timings = groupTimings[groupKey]
+        frameCount = max([frameCount] + [timing.frameCount for timing in timings])
+        peakWrites += group.digitCount * max([0] + [timing.peakWrites for timing in timings])
+    return frameCount, peakWrites
+
+def parseGroup(text):
+    # return DigitGroup from "digits,thickness,length"
+    try:
+        digitCount, segmentWidth, segmentLength = [int(value) for value in text.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected DIGITS,THICKNESS,LENGTH not [{}]".format(text))
+    if digitCount < 1:
+        raise argparse.ArgumentTypeError("a group needs at least one digit not {}".format(digitCount))
+    try:
+        pymorph.checkSegmentSize(segmentLength, segmentWidth)
+    except ValueError as error:
+        raise argparse.ArgumentTypeError(str(error))
+    return DigitGroup(digitCount, segmentWidth, segmentLength)
+
+# -----------------------------------------------------------------------------
+#  main application
+# -----------------------------------------------------------------------------
+def main(argv=None):
+    signal(SIGPIPE,SIG_DFL)
+
+    parser = argparse.ArgumentParser(description=script_info, epilog='For further details see: ' + pymorph.project_url)
+    parser.add_argument("-g", '--glyph_set', help='glyph set to simulate (default: stock digits)', default='')
+    parser.add_argument("-s", '--search', help='generate tables using a search objective', choices=pymorph.searchObjectiveSet, default=None)
+    parser.add_argument("-l", '--segment_length', help='segment length in pixels (default: {})'.format(pymorph.defaultSegmentLength), type=pymorph.segmentLengthArg, default=pymorph.defaultSegmentLength)
+    parser.add_argument("-w", '--segment_width', help='segment width in pixels (default: 1)', type=pymorph.segmentWidthArg, default=1)
+    parser.add_argument('--worst', help='number of worst transitions to list (default: 5)', type=int, default=5)
+    parser.add_argument("-a", '--all', help='list the timing of every transition', action="store_true")
+    parser.add_argument('--group', help='digit group of a layout as DIGITS,THICKNESS,LENGTH (repeatable, default: the demo layout)', type=parseGroup, action='append', default=None)
+    parser.add_argument('--budget', help='pixel writes allowed per frame for the layout', type=int, default=0)
+    parse_args = parser.parse_args(argv)
+
+    try:
+        if len(parse_args.glyph_set) > 0:
+            engine = pymorph.engineForGlyphSet(pymorph.loadGlyphSet(parse_args.glyph_set), parse_args.search, parse_args.segment_length, segmentWidth=parse_args.segment_width)
+        else:
+            engine = pymorph.TransitionEngine(search=parse_args.search, segmentLength=parse_args.segment_length, segmentWidth=parse_args.segment_width)
+    except (ValueError, KeyError) as error:
+        print('Bad glyph set {}: {}'.format(parse_args.glyph_set, error), file=sys.stderr)
+        return 1
+
+    labels = engine.labels
+    timings = simulateTable(engine, parse_args.segment_length, parse_args.segment_width)
+    print("{} transitions, segment length {}, width {}".format(len(timings), parse_args.segment_length, parse_args.segment_width))
+    if len(timings) > 0:
+        print("  frames: max {}, mean {:.2f}".format(max(timing.frameCount for timing in timings), sum(timing.frameCount for timing in timings) / float(len(timings))))
+        print("  pixel writes/frame: peak {}, total per transition: max {}".format(max(timing.peakWrites for timing in timings), max(timing.totalWrites for timing in timings)))
+
+    listed = timings if parse_args.all else worstTransitions(timings, parse_args.worst)
+    if len(listed) > 0:
+        print("{} transitions:".format("All" if parse_args.all else "Worst"))
+    for timing in listed:
+        print("  {} -> {}: {} frames, {} writes (peak {}) {}".format(labels[timing.fmDigit], labels[timing.toDigit], timing.frameCount, timing.totalWrites, timing.peakWrites, timing.frameWrites))
+
+    layout = demoLayout if parse_args.group is None else parse_args.group
+    frameCount, peakWrites = layoutWorstCase(layout, engine)
+    print("Layout {}: worst case {} frames, {} pixel writes in a frame".format(" + ".join("{}x(w{},l{})".format(group.digitCount, group.segmentWidth, group.segmentLength) for group in layout), frameCount, peakWrites))
+    if parse_args.budget > 0:
+        if peakWrites > parse_args.budget:
+            print("  OVER budget of {} pixel writes per frame by {}".format(parse_args.budget, peakWrites - parse_args.budget))
+            return 2
+        print("  within budget of {} pixel writes per frame".format(parse_args.budget))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
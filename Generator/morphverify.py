@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# -----------------------------------------------------------------------------
+#  Transition table verifier for the tables generated by pymorph.py
+# -----------------------------------------------------------------------------
+# Executes each action list the way isp_hub75_morph7seg.spin2 and
+#  isp_hub75_morphSegment.spin2 do and checks the segments left ON are exactly
+#  those of the target glyph:
+#
+#   - the segment is found from the %GGG field (segments[GGG - 1])
+#   - commandSegment() ignores a command when the segment is already in the
+#     state asked for, otherwise it sets the step count and does the first update
+#   - the segment's state only changes once its step count runs out, so a segment
+#     commanded again while still animating ignores the command if it asks for
+#     the state it started in, otherwise the animation restarts with the new style
+#     (moveSegmentToState() never aborts: the state is always OFF or ON)
+#   - the update routine of the segment's kind aborts on a style it can't draw
+#     (horizontal: LT_TO_RT/RT_TO_LT, vertical: BOTTOM_UP/TOP_DOWN, sliding
+#     segments also COL_TO_LT/COL_TO_RT, all: IMMEDIATE)
+#   - animateStep() then updates each segment until its step count runs out
+#
+# With --pixels the final frame drawn (see morphrender.py) is also compared with
+#  the target glyph as drawn when nothing is changing, which catches styles that
+#  end with the wrong pixels lit even though the segment state is right.
+
+import sys
+import argparse
+from signal import signal, SIGPIPE, SIG_DFL
+from collections import namedtuple
+
+import glyphsets
+import tablepack
+import pymorph
+
+script_version = "0.1.0"
+script_name = 'morphverify.py'
+script_info = '{} v{}'.format(script_name, script_version)
+
+# segment state values (as in isp_hub75_morphSegment.spin2)
+STATE_TURNING_OFF = 1
+STATE_OFF = 2
+STATE_TURNING_ON = 3
+STATE_ON = 4
+
+# field masks of a command
+MASK_ONOFF = 0x01
+MASK_STYLE = 0x0E
+
+# style enum name by style field value
+styleNameDict = dict((value, name) for name, value in pymorph.commandValueDict.items() if value & MASK_STYLE)
+
+# styles each kind of segment can draw
+horizontalStyles = ("CMD_LT_TO_RT", "CMD_RT_TO_LT", "CMD_IMMEDIATE")
+verticalStyles = ("CMD_BOTTOM_UP", "CMD_TOP_DOWN", "CMD_IMMEDIATE")
+columnStyles = ("CMD_COL_TO_LT", "CMD_COL_TO_RT")
+
+# the outcome of executing one action list
+#   finalMask - segments ON once all animation is complete
+#   frameCount - updates until all animation is complete (the command's update is frame 1)
+#   problems - list of descriptions, ok is False when any problem is an error
+Verification = namedtuple('Verification', ['fmDigit', 'toDigit', 'fmMask', 'toMask', 'finalMask', 'frameCount', 'problems', 'ok'])
+
+def drawableStylesFor(model):
+    # return, for each segment, the set of style names its update routine handles
+    #  horizontal/vertical from the directions along which it meets its adjacents
+    styleSets = []
+    for segIdx in range(model.segmentCount):
+        directions = set(pymorph.directionNameSet[direction] for direction in model.directionTable[segIdx] if direction is not None)
+        styles = set(["CMD_IMMEDIATE"])
+        if directions & set(["left", "right"]):
+            styles.update(horizontalStyles)
+        if directions & set(["up", "down"]):
+            styles.update(verticalStyles)
+        if model.sourceTable[segIdx] is not None:
+            styles.update(columnStyles)
+        styleSets.append(styles)
+    return styleSets
+
+class TableVerifier(object):
+    # executes action lists against the segment state machine of a model
+
+    def __init__(self, model, segmentLength=pymorph.defaultSegmentLength):
+        self.model = model
+        self.segmentLength = segmentLength
+        self.drawableStyles = drawableStylesFor(model)
+        self.actionLimit = 0xFF if tablepack.actionWidthFor(model.segmentCount) == 1 else 0xFFFF
+
+    def verifyActions(self, fmDigit, toDigit, fmMask, toMask, actionCodes):
+        # return Verification of the action values commanded to morph fmMask into toMask
+        model = self.model
+        segmentCount = model.segmentCount
+        currentState = [STATE_ON if fmMask & bit else STATE_OFF for bit in model.bitTable]
+        nextState = list(currentState)
+        desiredEndState = list(currentState)
+        stepCount = [0] * segmentCount
+        problems = []
+        aborted = False
+        commanded = set()
+
+        def updateSegment(segIdx):
+            # updateSegmentToState(nextState)
+            if stepCount[segIdx] > 0:
+                stepCount[segIdx] -= 1
+            if stepCount[segIdx] == 0:
+                currentState[segIdx] = STATE_OFF if nextState[segIdx] == STATE_TURNING_OFF else STATE_ON
+
+        for actionIdx, code in enumerate(actionCodes):
+            if code == 0:
+                problems.append("action #{} is 0, the list ends there".format(actionIdx + 1))
+                break
+            if code > self.actionLimit:
+                problems.append("action #{} ${:X} does not fit the table".format(actionIdx + 1, code))
+                aborted = True
+                break
+            segmentField = code >> 5
+            if segmentField < 1 or segmentField > segmentCount:
+                problems.append("action #{} ${:02X} names no segment".format(actionIdx + 1, code))
+                aborted = True
+                break
+            segIdx = segmentCount - segmentField
+            segName = model.segmentNames[segIdx]
+            turnOn = (code & MASK_ONOFF) == 0
+            styleName = styleNameDict.get(code & MASK_STYLE, "CMD_UNKNOWN")
+            if segIdx in commanded:
+                problems.append("seg[{}] commanded more than once".format(segName))
+            commanded.add(segIdx)
+            if (turnOn and currentState[segIdx] != STATE_ON) or (not turnOn and currentState[segIdx] != STATE_OFF):
+                if styleName not in self.drawableStyles[segIdx]:
+                    problems.append("seg[{}] can't draw {} (spin2 aborts)".format(segName, styleName))
+                    aborted = True
+                    break
+                stepCount[segIdx] = pymorph.animationStepsFor(styleName, self.segmentLength)
+                nextState[segIdx] = STATE_TURNING_ON if turnOn else STATE_TURNING_OFF
+                desiredEndState[segIdx] = STATE_ON if turnOn else STATE_OFF
+                updateSegment(segIdx)
+            else:
+                problems.append("seg[{}] is {} {}, command ignored".format(segName, "still" if desiredEndState[segIdx] != currentState[segIdx] else "already",
+                                                                               "ON" if turnOn else "OFF"))
+
+        frameCount = 1 if len(commanded) > 0 else 0
+        if not aborted:
+            # animateStep() until every segment reaches its end state (a step count below 1 never runs out)
+            frameLimit = max(stepCount) + 1
+            while any(desiredEndState[segIdx] != currentState[segIdx] for segIdx in range(segmentCount)):
+                if frameCount > frameLimit:
+                    problems.append("animation never completes (step count {})".format(min(stepCount)))
+                    aborted = True
+                    break
+                frameCount += 1
+                for segIdx in range(segmentCount):
+                    if desiredEndState[segIdx] != currentState[segIdx]:
+                        updateSegment(segIdx)
+
+        finalMask = 0
+        for segIdx, bit in enumerate(model.bitTable):
+            if currentState[segIdx] == STATE_ON:
+                finalMask |= bit
+        if not aborted and finalMask != toMask:
+            if finalMask & ~toMask:
+                problems.append("left ON: {}".format(" ".join(model.namesForMask(finalMask & ~toMask))))
+            if toMask & ~finalMask:
+                problems.append("left OFF: {}".format(" ".join(model.namesForMask(toMask & ~finalMask))))
+        ok = not aborted and finalMask == toMask
+        return Verification(fmDigit, toDigit, fmMask, toMask, finalMask, frameCount, problems, ok)
+
+    def verifyResult(self, result):
+        # return Verification of a TransitionResult
+        return self.verifyActions(result.fmDigit, result.toDigit, result.fmMask, result.toMask, [action.code for action in result.actions])
+
+def verifyEngine(engine):
+    # return list of Verification for every transition the engine generates
+    verifier = TableVerifier(engine.model, engine.segmentLength)
+    return [verifier.verifyResult(result) for result in engine.transitions()]
+
+def verifyBinary(data, engine):
+    # return list of Verification for the action lists of a packed binary table (-f bin)
+    #  whose glyphs are those of the engine
+    glyphCount, actionLists = tablepack.actionListsFromBinary(data)
+    if glyphCount != len(engine.digitMaskSet):
+        raise ValueError("Table has {} glyphs, the glyph set {}".format(glyphCount, len(engine.digitMaskSet)))
+    verifier = TableVerifier(engine.model, engine.segmentLength)
+    masks = engine.digitMaskSet
+    return [verifier.verifyActions(fmGlyph, toGlyph, masks[fmGlyph], masks[toGlyph], actionLists[(fmGlyph, toGlyph)])
+            for fmGlyph in range(glyphCount) for toGlyph in range(glyphCount) if fmGlyph != toGlyph]
+
+def pixelProblemsFor(engine):
+    # return dict of (from, to): problem for transitions whose last frame differs from
+    #  the target drawn at rest (seven segment glyph sets only)
+    import morphrender
+    placements = morphrender.groupPlacements(0, 0, 1, engine.segmentLength, (0xFF, 0xFF, 0xFF))
+    renderer = morphrender.MorphRenderer(engine, placements, engine.segmentLength + 2, (2 * engine.segmentLength) + 3)
+    glyphCount = len(engine.digitMaskSet)
+    restingFrames = [renderer.renderTransition([glyph], [glyph])[-1] for glyph in range(glyphCount)]
+    pixelProblems = {}
+    for fmGlyph in range(glyphCount):
+        for toGlyph in range(glyphCount):
+            if fmGlyph != toGlyph:
+                finalFrame = renderer.renderTransition([fmGlyph], [toGlyph])[-1]
+                wrongPixels = int((finalFrame != restingFrames[toGlyph]).any(axis=2).sum())
+                if wrongPixels > 0:
+                    pixelProblems[(fmGlyph, toGlyph)] = "{} pixel{} wrong in the last frame".format(wrongPixels, "" if wrongPixels == 1 else "s")
+    return pixelProblems
+
+# -----------------------------------------------------------------------------
+#  main application
+# -----------------------------------------------------------------------------
+def main(argv=None):
+    signal(SIGPIPE,SIG_DFL)
+
+    searchChoices = ["first"] + pymorph.searchObjectiveSet
+    parser = argparse.ArgumentParser(description=script_info, epilog='For further details see: ' + pymorph.project_url)
+    parser.add_argument("-g", '--glyph_set', help='glyph set to verify (repeatable, default: all stock sets)', action='append', default=None)
+    parser.add_argument("-s", '--search', help='table generation to verify: first rule which fits or a search objective (repeatable, default: all)', choices=searchChoices, action='append', default=None)
+    parser.add_argument("-l", '--segment_length', help='segment length in pixels (default: {})'.format(pymorph.defaultSegmentLength), type=pymorph.segmentLengthArg, default=pymorph.defaultSegmentLength)
+    parser.add_argument("-b", '--binary', help='verify this packed binary table (-f bin output) of the (single) glyph set instead of generating', default='')
+    parser.add_argument("-p", '--pixels', help='also check the pixels of the last frame (seven segment sets, needs NumPy)', action="store_true")
+    parser.add_argument('--worst', help='number of failures to list per table (default: 5)', type=int, default=5)
+    parse_args = parser.parse_args(argv)
+
+    glyphSetNames = parse_args.glyph_set if parse_args.glyph_set is not None else sorted(glyphsets.glyphSetDict)
+    searches = parse_args.search if parse_args.search is not None else searchChoices
+    if len(parse_args.binary) > 0 and (len(glyphSetNames) != 1 or len(searches) != 1):
+        parser.error("--binary needs exactly one --glyph_set and one --search")
+
+    failedTables = 0
+    for glyphSetName in glyphSetNames:
+        verifiedSearches = set()
+        for search in searches:
+            try:
+                engine = pymorph.engineForGlyphSet(pymorph.loadGlyphSet(glyphSetName), None if search == "first" else search, parse_args.segment_length)
+                # "first" is the glyph set's own search objective when it has one
+                search = "first" if engine.search is None else engine.search
+                if search in verifiedSearches:
+                    continue
+                verifiedSearches.add(search)
+                if len(parse_args.binary) > 0:
+                    with open(parse_args.binary, "rb") as table_fp:
+                        verifications = verifyBinary(table_fp.read(), engine)
+                else:
+                    verifications = verifyEngine(engine)
+            except (ValueError, KeyError, OSError) as error:
+                print('{}: {}: {}'.format(script_name, glyphSetName, error), file=sys.stderr)
+                return 1
+
+            pixelsChecked = parse_args.pixels and sorted(engine.model.segmentNames) == list("abcdefg")
+            pixelProblems = pixelProblemsFor(engine) if pixelsChecked else {}
+            failures = []
+            for verification in verifications:
+                problems = list(verification.problems)
+                pairKey = (verification.fmDigit, verification.toDigit)
+                if pairKey in pixelProblems:
+                    problems.append(pixelProblems[pairKey])
+                if not verification.ok or pairKey in pixelProblems:
+                    failures.append((verification, problems))
+            noteCount = sum(1 for verification in verifications if verification.ok and len(verification.problems) > 0)
+            print("{} ({}): {} transitions, {} reach their target{}{}".format(glyphSetName, search, len(verifications), len(verifications) - len(failures),
+                                                                        ", {} with notes".format(noteCount) if noteCount > 0 else "",
+                                                                        ", pixels checked" if pixelsChecked else ""))
+            labels = engine.labels
+            for verification, problems in failures[:parse_args.worst]:
+                print("  {} -> {}: {}".format(labels[verification.fmDigit], labels[verification.toDigit], "; ".join(problems)))
+            if len(failures) > parse_args.worst:
+                print("  ... and {} more".format(len(failures) - parse_args.worst))
+            if len(failures) > 0:
+                failedTables += 1
+    return 1 if failedTables > 0 else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
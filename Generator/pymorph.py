@@ -1,23 +1,32 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from datetime import datetime
-from tzlocal import get_localzone
+# startup timing (see --profile_startup): taken before the other imports
+from time import perf_counter
+startupStarted = perf_counter()
 
 import os
-
-from enum import Enum
-
 import sys
 import os.path
 import argparse
-from time import time, sleep, localtime, strftime
-from collections import OrderedDict
-from colorama import init as colorama_init
-from colorama import Fore, Back, Style
+import itertools
+from time import localtime, strftime
+from collections import OrderedDict, namedtuple
+import json
+
+import glyphsets
+import tablepack
+import morphcache
+import morphprofile
+import tablewrite
 from signal import signal, SIGPIPE, SIG_DFL
 
-signal(SIGPIPE,SIG_DFL)
+# NOTE: colorama (optional) is imported when the first console message is shown
+#  on a terminal and hashlib when the first cache key is computed, so runs which
+#  don't need them (-q or redirected messages, no -c) start faster
+
+# seconds taken by each startup phase, reported by --profile_startup
+startupTimes = OrderedDict([("imports", perf_counter() - startupStarted)])
 
 script_version = "0.1.0"
 script_name = 'pymorph.py'
@@ -25,9 +34,6 @@ script_info = '{} v{}'.format(script_name, script_version)
 project_name = 'A Morphing Digits animation calculator'
 project_url = 'https://github.com/ironsheep/P2-LED-Matrix-Morphing-Digits'
 
-# we'll use this throughout
-local_tz = get_localzone()
-
 if False:
     # will be caught by python 2.7 to be illegal syntax
     print_line('Sorry, this script requires a python3 runtime environment.', file=sys.stderr)
@@ -35,65 +41,83 @@ if False:
 # Argparse
 opt_debug = False
 opt_verbose = False
+opt_quiet = False
 opt_writeOutput = False
-out_fp = None
+# where console messages go (None: stdout), stderr when the table is written to stdout
+console_fp = None
 
 # -----------------------------------------------------------------------------
 # Logging function
-def print_line(text, error=False, warning=False, info=False, verbose=False, debug=False, console=True, sd_notify=False, code=False):
-    timestamp = strftime('%Y-%m-%d %H:%M:%S', localtime())
+def logEnabled(error=False, warning=False, info=False, verbose=False, debug=False):
+    # return True if a print_line() message of this kind would be shown
+    #  (callers test this before doing any work to build their messages)
+    if error:
+        return True
+    if opt_quiet:
+        return False
+    if warning:
+        return True
+    if debug:
+        return opt_debug
+    if verbose and not info:
+        return opt_verbose
+    return True
+
+class PlainText(object):
+    # stands in for colorama's Fore and Style when it is not installed (or the
+    #  messages don't go to a terminal): every color is ''
+    def __getattr__(self, name):
+        return ''
+
+plainColors = (PlainText(), PlainText())
+
+# (Fore, Style) once the first console message is shown on a terminal
+consoleColors = None
+
+def loadConsoleColors(stream):
+    # return (Fore, Style) for messages written to stream: plain text unless stream
+    #  is a terminal, when colorama is imported the first time (plain text without it)
+    global consoleColors
+    isatty = getattr(stream, "isatty", None)
+    if isatty is None or not isatty():
+        return plainColors
+    if consoleColors is None:
+        startTime = perf_counter()
+        try:
+            from colorama import Fore, Style
+        except ImportError:
+            Fore, Style = plainColors
+        consoleColors = (Fore, Style)
+        startupTimes["colorama"] = perf_counter() - startTime
+    return consoleColors
+
+def print_line(text, *args, error=False, warning=False, info=False, verbose=False, debug=False, console=True, sd_notify=False):
+    # NOTE: text is only formatted with args (text.format(*args)) when the message is shown
+    #  (table output is written by tablewrite.writeChunks(), see main())
     if console:
-        if code:
-            if opt_writeOutput and out_fp is not None:
-                out_fp.write('{}'.format(text) + '\n')
-        elif error:
-            print(Fore.RED + Style.BRIGHT + '[{}] '.format(timestamp) + Style.RESET_ALL + '{}'.format(text) + Style.RESET_ALL, file=sys.stderr)
-        elif warning:
-            print(Fore.YELLOW + Style.BRIGHT + '[{}] '.format(timestamp) + '(WARNING) ' + Style.RESET_ALL + Fore.YELLOW  + '{}'.format(text) + Style.RESET_ALL)
-        elif info or verbose:
-            if info:
-                print(Fore.GREEN + Style.BRIGHT  + '[{}] '.format(timestamp) +  '- ' + '{}'.format(text) + Style.RESET_ALL)
-            elif opt_verbose:
-                print(Fore.YELLOW + '[{}] '.format(timestamp) + Style.RESET_ALL + '(VERBOSE) {}'.format(text) + Style.RESET_ALL)
-        elif debug:
-            if opt_debug:
-                print(Fore.CYAN + '[{}] '.format(timestamp) + '(DBG): ' + '{}'.format(text) + Style.RESET_ALL)
-        else:
-            print(Fore.GREEN + '[{}] '.format(timestamp) + Style.RESET_ALL + '{}'.format(text) + Style.RESET_ALL)
+        if logEnabled(error, warning, info, verbose, debug):
+            if len(args) > 0:
+                text = text.format(*args)
+            timestamp = strftime('%Y-%m-%d %H:%M:%S', localtime())
+            message_fp = sys.stderr if error else sys.stdout if console_fp is None else console_fp
+            Fore, Style = loadConsoleColors(message_fp)
+            if error:
+                print(Fore.RED + Style.BRIGHT + '[{}] '.format(timestamp) + Style.RESET_ALL + '{}'.format(text) + Style.RESET_ALL, file=message_fp)
+            elif warning:
+                print(Fore.YELLOW + Style.BRIGHT + '[{}] '.format(timestamp) + '(WARNING) ' + Style.RESET_ALL + Fore.YELLOW  + '{}'.format(text) + Style.RESET_ALL, file=message_fp)
+            elif info:
+                print(Fore.GREEN + Style.BRIGHT  + '[{}] '.format(timestamp) +  '- ' + '{}'.format(text) + Style.RESET_ALL, file=message_fp)
+            elif verbose:
+                print(Fore.YELLOW + '[{}] '.format(timestamp) + Style.RESET_ALL + '(VERBOSE) {}'.format(text) + Style.RESET_ALL, file=message_fp)
+            elif debug:
+                print(Fore.CYAN + '[{}] '.format(timestamp) + '(DBG): ' + '{}'.format(text) + Style.RESET_ALL, file=message_fp)
+            else:
+                print(Fore.GREEN + '[{}] '.format(timestamp) + Style.RESET_ALL + '{}'.format(text) + Style.RESET_ALL, file=message_fp)
 
-    timestamp_sd = strftime('%b %d %H:%M:%S', localtime())
     if sd_notify:
+        timestamp_sd = strftime('%b %d %H:%M:%S', localtime())
         sd_notifier.notify('STATUS={} - {}.'.format(timestamp_sd, unidecode(text)))
 
-# -----------------------------------------------------------------------------
-# Parsing command-line options
-parser = argparse.ArgumentParser(description=script_info, epilog='For further details see: ' + project_url)
-parser.add_argument("-v", "--verbose", help="increase output (v)erbosity", action="store_true")
-parser.add_argument("-d", "--debug", help="show (d)ebug output", action="store_true")
-parser.add_argument("-o", '--out_filename', help='write actions to output file', default='')
-parse_args = parser.parse_args()
-
-opt_debug = parse_args.debug
-opt_verbose = parse_args.verbose
-out_filename = parse_args.out_filename
-opt_writeOutput = len(out_filename) > 0
-
-print_line(script_info, info=True)
-if opt_verbose:
-    print_line('Verbose enabled', info=True)
-if opt_debug:
-    print_line('Debug enabled', debug=True)
-if opt_writeOutput:
-    print_line('Writing output to: {}'.format(out_filename), debug=True)
-
-if opt_writeOutput:
-    if os.path.exists(out_filename):
-        print_line('Out File {} already exists, Aborting!'.format(out_filename), error=True)
-        os._exit(1)
-    else:
-        print_line("Output started", debug=True)
-        out_fp = open(out_filename, "w")
-
 # -----------------------------------------------------------------------------
 #  Misc support routines
 # -----------------------------------------------------------------------------
@@ -128,17 +152,6 @@ adjacent9 = ("f", "e")
 # list of all segment adjancencies
 adjacentSegmentSet = [adjacent0, adjacent1, adjacent2, adjacent3, adjacent4, adjacent5, adjacent6, adjacent7, adjacent8, adjacent9]
 
-def adjacentSegementsFor(segmentName):
-    # return list of names of segments adjacent to given named segment
-    adjacents = []
-    for adjacentTuple in adjacentSegmentSet:
-        if segmentName in adjacentTuple:
-            if segmentName == adjacentTuple[0]:
-                adjacents.append(adjacentTuple[1])
-            else:
-                adjacents.append(adjacentTuple[0])
-    return adjacents
-
 # segments adjacent to segements w/direction to adjacent
 adjacentDict = {
     "a->b": "right",
@@ -163,27 +176,11 @@ adjacentDict = {
     "e->f": "up",
 }
 
-def relativeDirection(fmSegmentName, toSegmentName):
-    # return direction of fmSegment to toSegment
-    desiredDirection = None
-    directionKey = "{}->{}".format(fmSegmentName, toSegmentName)
-    if directionKey in adjacentDict:
-        desiredDirection = adjacentDict[directionKey]
-    return desiredDirection
-
 directions0 = ("down","up")
 directions1 = ("left","right")
 
 directionSet = [directions0, directions1]
 
-def oppositeDirection(direction):
-    desiredDirection = None
-    for directionTuple in directionSet:
-        if direction in directionTuple:
-            desiredDirection = directionTuple[1] if directionTuple[0] == direction else directionTuple[0]
-            break
-    return desiredDirection
-
 directions0 = ("up", "CMD_BOTTOM_UP")
 directions1 = ("down", "CMD_TOP_DOWN")
 directions2 = ("right", "CMD_LT_TO_RT")
@@ -196,34 +193,6 @@ directions5 = ("left", "CMD_COL_TO_LT")
 
 slideEnumSet = [directions4, directions5]
 
-def actionEnumFor(heading, direction):
-    print_line("* actionEnumFor({}, {})".format(heading, direction))
-    actionEnum = None
-    if heading == "slides":
-        # have column move (dir=L/R)
-        for slideTuple in slideEnumSet:
-            if direction in slideTuple:
-                print_line("  -- FOUND slideTuple=[{}]".format(slideTuple))
-                actionEnum = slideTuple[1] if slideTuple[0] == direction else slideTuple[0]
-                break
-            else:
-                print_line("  -- NOT FOUND slideTuple=[{}]".format(slideTuple))
-    else:
-        # have snake move (dir=L/R,U/D)
-        actionDirection = direction
-        if heading == "away":
-            actionDirection = oppositeDirection(direction)
-        for snakeTuple in snakeEnumSet:
-            if actionDirection in snakeTuple:
-                print_line("  -- FOUND actionDirection=[{}], snakeTuple=[{}]".format(actionDirection, snakeTuple))
-                actionEnum = snakeTuple[1] if snakeTuple[0] == actionDirection else snakeTuple[0]
-                break
-            else:
-                print_line("  -- NOT FOUND actionDirection=[{}], snakeTuple=[{}]".format(actionDirection, snakeTuple))
-
-    return actionEnum
-
-
 # special segments that move as a column
 slidingSegments = ("e", "f")
 
@@ -265,164 +234,883 @@ segment6enum = ("g", "SEG_MIDDLE_G")
 # list of all segment ENUM names
 segmentEnumSet = [segment0enum, segment1enum, segment2enum, segment3enum, segment4enum, segment5enum, segment6enum]
 
-def segmentEnumforName(segmentName):
-    # return enum name for givem segment name else None
-    desiredEnum = None
-    for segmentTuple in segmentEnumSet:
-        if segmentName in segmentTuple:
-            #print_line("- FOUND segmentTuple=[{}]".format(segmentTuple))
-            desiredEnum = segmentTuple[1] if segmentTuple[0] == segmentName else segmentTuple[0]
-            break
-        #else:
-            #print_line("- NOT FOUND segmentTuple=[{}]".format(segmentTuple))
-    return desiredEnum
+# command field values (see CON section of isp_hub75_morphSegment.spin2)
+commandValueDict = {
+    "CMD_TURN_ON": 0x00,
+    "CMD_TURN_OFF": 0x01,
+    "CMD_UNKNOWN": 0x00,
+    "CMD_BOTTOM_UP": 0x02,
+    "CMD_TOP_DOWN": 0x04,
+    "CMD_LT_TO_RT": 0x06,
+    "CMD_RT_TO_LT": 0x08,
+    "CMD_COL_TO_RT": 0x0A,
+    "CMD_COL_TO_LT": 0x0C,
+    "CMD_IMMEDIATE": 0x0E,
+}
+
+# segment changes as classified by the engine (indexable by state code)
+segmentStateSet = ["turning ON", "turning OFF", "staying ON", "staying OFF"]
 
+ST_TURNING_ON = 0
+ST_TURNING_OFF = 1
+ST_STAYING_ON = 2
+ST_STAYING_OFF = 3
 
-transitionCount = 0
-warningCount = 0
-missingNameSet = []
+# snake rules in order of preference
+#  (changing segment is, adjacent segment is, command, heading)
+snakeRule0 = ("turning OFF", "staying ON", "CMD_TURN_OFF", "towards")
+snakeRule1 = ("turning OFF", "turning ON", "CMD_TURN_OFF", "towards")
+snakeRule2 = ("turning ON", "staying OFF", "CMD_TURN_ON", "towards")
+snakeRule3 = ("turning ON", "turning OFF", "CMD_TURN_ON", "towards")
+snakeRule4 = ("turning ON", "staying ON", "CMD_TURN_ON", "away")
+
+snakeRuleSet = [snakeRule0, snakeRule1, snakeRule2, snakeRule3, snakeRule4]
+
+# column slide rules (used when no snake rule fits) in order of preference
+#  (sliding segment is, source segment is, command, slide direction)
+slideRule0 = ("turning ON", "staying ON", "CMD_TURN_ON", "left")
+slideRule1 = ("turning OFF", "staying ON", "CMD_TURN_OFF", "right")
+slideRule2 = ("turning OFF", "turning ON", "CMD_TURN_OFF", "right")
+slideRule3 = ("turning ON", "turning OFF", "CMD_TURN_ON", "left")
+
+slideRuleSet = [slideRule0, slideRule1, slideRule2, slideRule3]
 
 # -----------------------------------------------------------------------------
-# write an action taken, also filter and write to output data file
+#  Bitmask segment model
+# -----------------------------------------------------------------------------
+# digits are masks of lit segments using the bit layout of the spin2 code
+#  (SOR_* values in isp_hub75_morphSegment.spin2, segmentsByDigit in
+#  isp_hub75_morph7seg.spin2): a=$40, b=$20, c=$10, d=$08, e=$04, f=$02, g=$01
 #
-def log_line(message):
-    print_line(message)
-    line_left, line_right = message.split(" -> ")
-    #print_line("-   seg[{}] turning OFF while [{}] is staying ON. -> Segment [{}] snakes OFF towards [{}]!".format(segmentName, adjacentName, segmentName, adjacentName))
-    #print_line("#   seg[{}] turning OFF while [{}] is staying ON.".format(segmentName, adjacentName), code=True)
-    #print_line("Segment [{}] snakes OFF towards [{}]!".format(segmentName, adjacentName), code=True)
-    print_line(message)
-    if line_left is not None and len(line_left) > 0:
-        print_line("\t{}".format(line_left.replace("-   ", "' ")), code=True)
-    if line_right is not None and len(line_right) > 0:
-        print_line("\t' {}".format(line_right.replace("!", "")), code=True)
+# one animation a segment performs during a transition
+#   segment  - name of the segment changing (e.g., "a")
+#   command  - CMD_TURN_ON or CMD_TURN_OFF
+#   style    - animation style enum name (e.g., "CMD_LT_TO_RT")
+#   related  - name of the segment which led to this choice
+#   relation - what the related segment is doing (e.g., "staying ON")
+#   heading  - "towards", "away", "slides" or "immediate" (no rule fits, search modes only)
+#   code     - the command value (segment + command + style) as placed in the table
+SegmentAction = namedtuple('SegmentAction', ['segment', 'command', 'style', 'related', 'relation', 'heading', 'code'])
+
+# direction names (indexable by direction code)
+directionNameSet = ["up", "down", "left", "right"]
+
+directionCodeDict = dict((name, code) for code, name in enumerate(directionNameSet))
+
+# opposite of each direction code
+oppositeDirectionTable = [directionCodeDict[dict(directionSet + [(up, down) for down, up in directionSet])[name]] for name in directionNameSet]
+
+# snake and column-slide style enum names for each direction code (None if no such style)
+snakeStyleTable = [dict(snakeEnumSet).get(name) for name in directionNameSet]
+slideStyleTable = [dict(slideEnumSet).get(name) for name in directionNameSet]
+
+# segment length used for step counts when none is given (as in the demo clocks)
+defaultSegmentLength = 6
+
+# shortest segment which animates: a column slide takes one step fewer than the length
+minSegmentLength = 2
+
+def checkSegmentSize(segmentLength, segmentWidth=1):
+    # raise ValueError unless segments of segmentLength x segmentWidth pixels can animate
+    if segmentLength < minSegmentLength:
+        raise ValueError("Segment length must be at least {} not {}".format(minSegmentLength, segmentLength))
+    if segmentWidth < 1:
+        raise ValueError("Segment width must be at least 1 not {}".format(segmentWidth))
+
+def intAtLeast(minimum):
+    # return argparse type converting text to an int of at least minimum
+    def parseInt(text):
+        try:
+            value = int(text)
+        except ValueError:
+            raise argparse.ArgumentTypeError("expected a whole number not [{}]".format(text))
+        if value < minimum:
+            raise argparse.ArgumentTypeError("must be at least {} not {}".format(minimum, value))
+        return value
+    return parseInt
+
+# argparse types of the -l and -w options of every script
+segmentLengthArg = intAtLeast(minSegmentLength)
+segmentWidthArg = intAtLeast(1)
+
+def animationStepsFor(style, segmentLength):
+    # return the number of animateStep() calls a segment takes to complete a style
+    #  (see commandSegment() in isp_hub75_morphSegment.spin2)
+    if style == "CMD_IMMEDIATE":
+        return 1
+    if style == "CMD_COL_TO_RT" or style == "CMD_COL_TO_LT":
+        return segmentLength - 1
+    return segmentLength
+
+def actionFrameWrites(isColumnSegment, command, style, segmentLength, segmentWidth=1):
+    # return list of pixel writes made by each update of one segment animation
+    #  (each update clears the segment and redraws the pixels still lit, see the
+    #  update routines of isp_hub75_morphSegment.spin2)
+    #  isColumnSegment: segment can slide as a column (updateSpecialVerticalSegment(),
+    #  which clears a segmentLength x segmentLength area on each update)
+    #  segmentWidth: pixels across a segment, each pixel along it is drawn this many times
+    #  NOTE: placeSegment() takes a segment thickness but the update routines draw
+    #  (and clear) one line whatever it is, so width 1 (the default) counts what the
+    #  driver does today. A larger width estimates the load of drawing every line
+    #  of thick segments, for comparing layouts (morphsim.py --group)
+    stepCount = animationStepsFor(style, segmentLength)
+    clearWrites = segmentLength * segmentLength if isColumnSegment else segmentLength * segmentWidth
+    turningOn = command == "CMD_TURN_ON"
+    frameWrites = []
+    for update in range(1, stepCount + 1):
+        # same arithmetic as the spin2 update routines (stepsLeft is stepCount before it is decremented)
+        stepsLeft = stepCount - update + 1
+        if turningOn:
+            pixelsOn = segmentLength - (stepsLeft - 1)
+        else:
+            pixelsOn = stepsLeft - 1
+        if style == "CMD_IMMEDIATE":
+            drawWrites = segmentLength
+        elif style == "CMD_COL_TO_LT" or style == "CMD_COL_TO_RT":
+            # one column is drawn (two while sliding OFF to the right) until none remain lit
+            if turningOn:
+                drawWrites = segmentLength
+            elif pixelsOn > 0:
+                drawWrites = 2 * segmentLength if style == "CMD_COL_TO_RT" else segmentLength
+            else:
+                drawWrites = 0
+        else:
+            # snakes draw the pixels lit so far (or still lit)
+            drawWrites = pixelsOn
+        frameWrites.append(clearWrites + drawWrites * segmentWidth)
+    return frameWrites
+
+def addFrameWrites(frameWrites, actionWrites):
+    # return per frame pixel writes with those of one more action (starting in frame 1) added
+    combined = list(frameWrites) + [0] * max(0, len(actionWrites) - len(frameWrites))
+    for frameIdx, writes in enumerate(actionWrites):
+        combined[frameIdx] += writes
+    return combined
+
+def bitCount(mask):
+    # return the number of segments in the mask
+    return bin(mask).count("1")
+
+class SegmentModel(object):
+    # segment names, adjacency, directions and rule choices precomputed into
+    #  integer-indexed tables so the engine only does mask tests
+
+    def __init__(self, segmentNames, adjacentPairs, adjacentDirections, slidingSources, segmentEnums):
+        # segmentNames: names in table order, the first name is the highest bit
+        # adjacentPairs: list of (name, name) adjacencies, in order of preference
+        # adjacentDirections: dict of "fm->to": direction of [to] as seen from [fm]
+        # slidingSources: list of (sliding segment, source segment) tuples
+        # segmentEnums: list of (segment name, spin2 SEG_* enum name) tuples
+        count = len(segmentNames)
+        self.segmentNames = list(segmentNames)
+        self.segmentCount = count
+        self.allSegmentsMask = (1 << count) - 1
+        self.indexByName = dict((name, idx) for idx, name in enumerate(self.segmentNames))
+        self.bitTable = [1 << (count - 1 - idx) for idx in range(count)]
+        # SEG_* values carry (bit number + 1) in the upper bits: SEG_TOP_A=$E0 ... SEG_MIDDLE_G=$20
+        #  NOTE: with more than 7 segments the values no longer fit a byte, such models
+        #  are written as word actions (-f dat or bin, see tablepack.actionWidthFor())
+        self.actionWidth = tablepack.actionWidthFor(count)
+        if (count << 5) > (1 << (8 * self.actionWidth)) - 1:
+            raise ValueError("{} segments do not fit the {}-byte actions".format(count, self.actionWidth))
+        self.segmentValueTable = [(count - idx) << 5 for idx in range(count)]
+        enumByName = dict(segmentEnums)
+        self.enumTable = [enumByName.get(name) for name in self.segmentNames]
+
+        # direction to each adjacent and adjacents of each segment (in adjacency order)
+        #  NOTE: an adjacency may be one-way (e.g., a segment touching the middle of another)
+        self.directionTable = [[None] * count for idx in range(count)]
+        for directionKey, direction in adjacentDirections.items():
+            fmName, toName = directionKey.split("->")
+            self.directionTable[self.indexByName[fmName]][self.indexByName[toName]] = directionCodeDict[direction]
+        self.adjacentTable = [[] for idx in range(count)]
+        for fmName, toName in adjacentPairs:
+            fmIdx = self.indexByName[fmName]
+            toIdx = self.indexByName[toName]
+            if self.directionTable[fmIdx][toIdx] is None and self.directionTable[toIdx][fmIdx] is None:
+                raise ValueError("No direction for adjacent segments [{}] and [{}]".format(fmName, toName))
+            if self.directionTable[fmIdx][toIdx] is not None:
+                self.adjacentTable[fmIdx].append(toIdx)
+            if self.directionTable[toIdx][fmIdx] is not None:
+                self.adjacentTable[toIdx].append(fmIdx)
+
+        # source segment of each sliding segment (else None)
+        self.sourceTable = [None] * count
+        for slidingName, sourceName in slidingSources:
+            self.sourceTable[self.indexByName[slidingName]] = self.indexByName[sourceName]
+
+        # every rule which could fire for each segment [segIdx][ST_TURNING_ON or ST_TURNING_OFF]
+        self.candidateTable = [self._candidatesFor(segIdx) for segIdx in range(count)]
+        # the action used when no rule fits (search modes only) [segIdx][ST_TURNING_ON or ST_TURNING_OFF]
+        self.fallbackTable = [self._fallbacksFor(segIdx) for segIdx in range(count)]
+
+    def maskForSegments(self, segmentNames):
+        # return the mask of the named segments
+        mask = 0
+        for segmentName in segmentNames:
+            if segmentName not in self.indexByName:
+                raise ValueError("Unknown segment [{}]".format(segmentName))
+            mask |= self.bitTable[self.indexByName[segmentName]]
+        return mask
+
+    def namesForMask(self, mask):
+        # return list of names of the segments in the mask (in table order)
+        return [self.segmentNames[segIdx] for segIdx, bit in enumerate(self.bitTable) if mask & bit]
+
+    def actionFor(self, segIdx, command, style, relatedIdx, relation, heading):
+        # return SegmentAction (with command value) for a segment
+        code = self.segmentValueTable[segIdx] | commandValueDict[command] | commandValueDict[style]
+        return SegmentAction(self.segmentNames[segIdx], command, style, self.segmentNames[relatedIdx], relation, heading, code)
+
+    def _fallbacksFor(self, segIdx):
+        # return (turning ON, turning OFF) actions for a segment no rule fits
+        #  NOTE: the spin2 update routines redraw a segment turned OFF with CMD_IMMEDIATE
+        #  (its state is OFF but its pixels stay lit) so it snakes OFF along its own axis
+        #  instead, towards its first adjacent (IMMEDIATE only when it has none)
+        offStyle = "CMD_IMMEDIATE"
+        if len(self.adjacentTable[segIdx]) > 0:
+            offStyle = snakeStyleTable[self.directionTable[segIdx][self.adjacentTable[segIdx][0]]]
+        return (self.actionFor(segIdx, "CMD_TURN_ON", "CMD_IMMEDIATE", segIdx, "turning ON", "fallback"),
+                self.actionFor(segIdx, "CMD_TURN_OFF", offStyle, segIdx, "turning OFF", "fallback"))
+
+    def _candidatesFor(self, segIdx):
+        # return (turning ON, turning OFF) candidates for a segment, each a tuple
+        #  of (related bit, related state code, SegmentAction) in order of preference
+        candidates = ([], [])
+        for segmentState in (ST_TURNING_ON, ST_TURNING_OFF):
+            for adjacentIdx in self.adjacentTable[segIdx]:
+                direction = self.directionTable[segIdx][adjacentIdx]
+                for segIs, adjacentIs, command, heading in snakeRuleSet:
+                    if segmentStateSet.index(segIs) == segmentState:
+                        styleDirection = oppositeDirectionTable[direction] if heading == "away" else direction
+                        action = self.actionFor(segIdx, command, snakeStyleTable[styleDirection], adjacentIdx, adjacentIs, heading)
+                        candidates[segmentState].append((self.bitTable[adjacentIdx], segmentStateSet.index(adjacentIs), action))
+            sourceIdx = self.sourceTable[segIdx]
+            if sourceIdx is not None:
+                for segIs, sourceIs, command, direction in slideRuleSet:
+                    if segmentStateSet.index(segIs) == segmentState:
+                        action = self.actionFor(segIdx, command, slideStyleTable[directionCodeDict[direction]], sourceIdx, sourceIs, "slides")
+                        candidates[segmentState].append((self.bitTable[sourceIdx], segmentStateSet.index(sourceIs), action))
+        return (tuple(candidates[ST_TURNING_ON]), tuple(candidates[ST_TURNING_OFF]))
+
+# the stock seven segment model, built once
+sevenSegmentModel = SegmentModel(segmentNameSet, adjacentSegmentSet, adjacentDict, sourceSegmentSet, segmentEnumSet)
+
+def adjacentSegementsFor(segmentName):
+    # return list of names of segments adjacent to given named segment
+    model = sevenSegmentModel
+    return [model.segmentNames[adjacentIdx] for adjacentIdx in model.adjacentTable[model.indexByName[segmentName]]]
+
+def relativeDirection(fmSegmentName, toSegmentName):
+    # return direction of fmSegment to toSegment
+    model = sevenSegmentModel
+    direction = model.directionTable[model.indexByName[fmSegmentName]][model.indexByName[toSegmentName]]
+    return directionNameSet[direction] if direction is not None else None
+
+def oppositeDirection(direction):
+    return directionNameSet[oppositeDirectionTable[directionCodeDict[direction]]] if direction in directionCodeDict else None
+
+def actionEnumFor(heading, direction):
+    # return the style enum name for a heading ("towards", "away", "slides") and direction
+    if direction not in directionCodeDict:
+        return None
+    directionCode = directionCodeDict[direction]
+    if heading == "slides":
+        # have column move (dir=L/R)
+        return slideStyleTable[directionCode]
+    # have snake move (dir=L/R,U/D)
+    if heading == "away":
+        directionCode = oppositeDirectionTable[directionCode]
+    return snakeStyleTable[directionCode]
+
+def segmentEnumforName(segmentName):
+    # return enum name for givem segment name else None
+    model = sevenSegmentModel
+    return model.enumTable[model.indexByName[segmentName]] if segmentName in model.indexByName else None
 
 # -----------------------------------------------------------------------------
-# calculate the segment changes between two digits
-#
-def calcSegDiffs(ltDigit, rtDigit):
-    global transitionCount
-    global warningCount
-    turningOn = []
-    turningOff = []
-    stayingOn = []
-    stayingOff = []
-    transitionCount += 1
-    print_line("#{}: checking lt={}, rt={}".format(transitionCount, ltDigit, rtDigit), info=True)
-    print_line("\n{}{}_{}\n\t' transition #{}: digit {} -> {}".format(tablePrefix, ltDigit, rtDigit, transitionCount, ltDigit, rtDigit), code=True)
-    ltTuple = digitTupleSet[ltDigit]
-    rtTuple = digitTupleSet[rtDigit]
-    # classify changes and NOT changes
-    for segName in segmentNameSet:
-        if segName in ltTuple or segName in rtTuple:
-            # if segment is ON, going ON or going OFF
-            print_line("* Processing seg=[{}]".format(segName), debug=True)
-            if segName in ltTuple and segName in rtTuple:
-                # have segment in both digits (Staying ON)
-                stayingOn.append(segName)
-            elif segName in ltTuple:
-                # have segment turning OFF
-                print_line("* seg=[{}] turning OFF".format(segName), verbose=True)
-                turningOff.append(segName)
-            else: # segName in rtTuple:
-                # have segment turning ON
-                print_line("* seg=[{}] turning ON".format(segName), verbose=True)
-                turningOn.append(segName)
+#  Transition engine
+# -----------------------------------------------------------------------------
+class TransitionResult(namedtuple('TransitionResult', ['fmDigit', 'toDigit', 'fmMask', 'toMask', 'actions', 'missing'])):
+    # the result of studying one digit -> digit transition
+    #   fmMask, toMask - lit segments before and after
+    #   actions - list of SegmentAction in table order
+    #   missing - names of changing segments for which no rule fits
+    __slots__ = ()
+
+    @property
+    def turningOn(self):
+        return self.toMask & ~self.fmMask
+
+    @property
+    def turningOff(self):
+        return self.fmMask & ~self.toMask
+
+    @property
+    def stayingOn(self):
+        return self.fmMask & self.toMask
+
+# what a search tries to minimize, see TransitionEngine.searchMaskDiffs()
+searchObjectiveSet = ["steps", "frames", "pixels"]
+
+# most combinations of choices the "pixels" search scores, beyond this it improves one segment at a time
+pixelSearchLimit = 4096
+
+# bump when the way the engine turns rules into actions changes (invalidates cached results)
+ruleSetVersion = 2
+
+class TransitionEngine(object):
+    # determine the segment animations needed to morph one digit into another
+    #  NOTE: this does no console or file I/O, callers report/emit the results
+
+    def __init__(self, digitSet=None, model=None, labels=None, search=None, segmentLength=defaultSegmentLength, cache=None, segmentWidth=1):
+        # digitSet: list of tuples of lit segment names (indexable by digit)
+        # model: SegmentModel the digits are drawn with
+        # labels: name of each digit (used in table names), default is its index
+        # search: None to use the first rule which fits, else one of searchObjectiveSet
+        # segmentLength: segment length (pixels) used to count animation steps when searching
+        # cache: TransitionCache (see morphcache.py) to reuse results from earlier runs, else None
+        # segmentWidth: segment width (pixels) used to count pixel writes when searching for "pixels"
+        if search is not None and search not in searchObjectiveSet:
+            raise ValueError("Unknown search objective [{}], expected one of {}".format(search, searchObjectiveSet))
+        self.model = sevenSegmentModel if model is None else model
+        self.digitSet = digitTupleSet if digitSet is None else digitSet
+        self.digitMaskSet = [self.model.maskForSegments(digitTuple) for digitTuple in self.digitSet]
+        self.labels = [str(digit) for digit in range(len(self.digitSet))] if labels is None else list(labels)
+        self.search = search
+        self.segmentLength = segmentLength
+        self.segmentWidth = segmentWidth
+        # search results by (fmMask, toMask), shared by all pairs with the same ON/OFF/stay partition
+        self.searchCache = {}
+        self.cache = cache
+        self.segmentDigests = None
+        # GeneratorProfile (see morphprofile.py) timing the rule phases, else None
+        self.profile = None
+
+    def calcSegDiffs(self, ltDigit, rtDigit):
+        # return TransitionResult describing how to morph ltDigit into rtDigit
+        fmMask = self.digitMaskSet[ltDigit]
+        toMask = self.digitMaskSet[rtDigit]
+        actions, missing = self.calcMaskDiffs(fmMask, toMask)
+        return TransitionResult(ltDigit, rtDigit, fmMask, toMask, actions, missing)
+
+    def calcMaskDiffs(self, fmMask, toMask):
+        # return (actions, missing) needed to morph segment mask fmMask into toMask
+        if self.cache is None:
+            return self._calcMaskDiffs(fmMask, toMask)
+        cacheKey = self.cacheKeyFor(fmMask, toMask)
+        cached = self.cache.get(cacheKey, SegmentAction)
+        if cached is not None:
+            return cached
+        actions, missing = self._calcMaskDiffs(fmMask, toMask)
+        self.cache.put(cacheKey, actions, missing)
+        return actions, missing
+
+    def cacheKeyFor(self, fmMask, toMask):
+        # return hex digest naming everything the result for fmMask -> toMask depends on:
+        #  the masks, the search settings and the rules which could fire for each changing segment
+        import hashlib
+        model = self.model
+        if self.segmentDigests is None:
+            # digest of the candidates (and fallback) of each segment [segIdx][ST_TURNING_ON or ST_TURNING_OFF]
+            self.segmentDigests = [tuple(hashlib.sha1(repr((model.candidateTable[segIdx][segmentState], model.fallbackTable[segIdx][segmentState])).encode()).hexdigest()
+                                         for segmentState in (ST_TURNING_ON, ST_TURNING_OFF)) for segIdx in range(model.segmentCount)]
+        changing = fmMask ^ toMask
+        keyParts = [str(ruleSetVersion), str(self.search), str(self.segmentLength) if self.search is not None else "-", "{:x}".format(fmMask), "{:x}".format(toMask)]
+        if self.search == "pixels":
+            keyParts.append("w{}".format(self.segmentWidth))
+        for segIdx, bit in enumerate(model.bitTable):
+            if changing & bit:
+                keyParts.append(self.segmentDigests[segIdx][ST_TURNING_ON if toMask & bit else ST_TURNING_OFF])
+        return hashlib.sha1("|".join(keyParts).encode()).hexdigest()
+
+    def stateMasksFor(self, fmMask, toMask):
+        # return masks of the segments in each state (indexed by state code) for fmMask -> toMask
+        changing = fmMask ^ toMask
+        return (changing & toMask, changing & fmMask, fmMask & toMask, self.model.allSegmentsMask & ~(fmMask | toMask))
+
+    def _calcMaskDiffs(self, fmMask, toMask):
+        # return (actions, missing) computed from the rules (timing each phase when profiling)
+        profile = self.profile
+        if profile is None:
+            return self.matchRules(fmMask, toMask, self.stateMasksFor(fmMask, toMask))
+        startTime = perf_counter()
+        stateMasks = self.stateMasksFor(fmMask, toMask)
+        matchTime = perf_counter()
+        actions, missing = self.matchRules(fmMask, toMask, stateMasks)
+        profile.addPhaseTime("classification", matchTime - startTime)
+        profile.addPhaseTime("matching", perf_counter() - matchTime)
+        return actions, missing
+
+    def matchRules(self, fmMask, toMask, stateMasks):
+        # return (actions, missing) for the segments in each state (see stateMasksFor())
+        if self.search is not None:
+            return self.searchMaskDiffs(fmMask, toMask, stateMasks)
+        model = self.model
+        actions = []
+        missing = []
+        # segments turning OFF are listed before those turning ON
+        for segmentState in (ST_TURNING_OFF, ST_TURNING_ON):
+            changingMask = stateMasks[segmentState]
+            if changingMask == 0:
+                continue
+            for segIdx, bit in enumerate(model.bitTable):
+                if changingMask & bit:
+                    for relatedBit, relatedState, action in model.candidateTable[segIdx][segmentState]:
+                        if stateMasks[relatedState] & relatedBit:
+                            actions.append(action)
+                            break
+                    else:
+                        missing.append(model.segmentNames[segIdx])
+        return actions, missing
+
+    def searchMaskDiffs(self, fmMask, toMask, stateMasks=None):
+        # return (actions, missing) choosing, per changing segment, among every rule which fits
+        #  the one best meeting the search objective (a fallback action when no rule fits)
+        #
+        # NOTE: segments animate independently and all start together, so the best over all
+        #  assignments is found per segment:
+        #   "steps"  - each segment takes its fewest-steps choice (total steps is minimal)
+        #   "frames" - the transition takes as many frames as its slowest segment's fastest
+        #              choice, each segment then keeps its preferred rule unless it is slower
+        #   "pixels" - fewest pixel writes in the busiest frame, see leastPeakWrites()
+        cacheKey = (fmMask, toMask)
+        if cacheKey in self.searchCache:
+            return self.searchCache[cacheKey]
+        model = self.model
+        segmentLength = self.segmentLength
+        if stateMasks is None:
+            stateMasks = self.stateMasksFor(fmMask, toMask)
+        # legal choices (in rule preference order) for each changing segment
+        choiceSets = []
+        for segmentState in (ST_TURNING_OFF, ST_TURNING_ON):
+            changingMask = stateMasks[segmentState]
+            if changingMask == 0:
+                continue
+            for segIdx, bit in enumerate(model.bitTable):
+                if changingMask & bit:
+                    choices = [action for relatedBit, relatedState, action in model.candidateTable[segIdx][segmentState] if stateMasks[relatedState] & relatedBit]
+                    if len(choices) == 0:
+                        choices = [model.fallbackTable[segIdx][segmentState]]
+                    choiceSets.append([(animationStepsFor(action.style, segmentLength), action) for action in choices])
+
+        actions = []
+        if self.search == "pixels":
+            actions = self.leastPeakWrites(choiceSets)
+        elif self.search == "steps":
+            for choices in choiceSets:
+                fewestSteps = min(steps for steps, action in choices)
+                actions.append(next(action for steps, action in choices if steps == fewestSteps))
         else:
-            # else segment is staying OFF
-            stayingOff.append(segName)
-            #print_line("- Lt=[{}], Rt=[{}] has NO seg=[{}]".format(ltTuple, rtTuple, segName), debug=True)
+            frameCount = max([min(steps for steps, action in choices) for choices in choiceSets] + [0])
+            for choices in choiceSets:
+                actions.append(next(action for steps, action in choices if steps <= frameCount))
+        self.searchCache[cacheKey] = (actions, [])
+        return actions, []
+
+    def actionWritesFor(self, action):
+        # return list of pixel writes in each frame of one action on this engine's segments
+        isColumnSegment = self.model.sourceTable[self.model.indexByName[action.segment]] is not None
+        return actionFrameWrites(isColumnSegment, action.command, action.style, self.segmentLength, self.segmentWidth)
+
+    def leastPeakWrites(self, choiceSets):
+        # return actions (one from each list of (steps, action) choices) giving the fewest
+        #  pixel writes in the busiest frame, then the fewest frames, then the fewest writes
+        #  (ties keep the preferred rules)
+        #
+        # NOTE: choices writing the same pixels per frame (e.g. snakes in either direction)
+        #  are scored once, so few combinations remain: only segments which can also slide
+        #  as a column have a real choice
+        writeSets = []
+        for choices in choiceSets:
+            actionsByWrites = OrderedDict()
+            for steps, action in choices:
+                actionsByWrites.setdefault(tuple(self.actionWritesFor(action)), action)
+            writeSets.append(list(actionsByWrites.items()))
+
+        def scoreFor(frameWrites):
+            return (max(frameWrites + [0]), len(frameWrites), sum(frameWrites))
+
+        combinationCount = 1
+        for writeSet in writeSets:
+            combinationCount *= len(writeSet)
+        if combinationCount <= pixelSearchLimit:
+            bestScore = None
+            for combination in itertools.product(*writeSets):
+                frameWrites = []
+                for actionWrites, action in combination:
+                    frameWrites = addFrameWrites(frameWrites, actionWrites)
+                score = scoreFor(frameWrites)
+                if bestScore is None or score < bestScore:
+                    bestScore = score
+                    bestCombination = combination
+            return [action for actionWrites, action in bestCombination]
 
-    # now identify transitions needed to cause the changes
-    nbrTransitions = len(turningOff) + len(turningOn)
+        # too many to score: start from the preferred rules and change one segment at a
+        #  time while that lowers the score
+        chosen = [0] * len(writeSets)
+        improved = True
+        while improved:
+            improved = False
+            for setIdx, writeSet in enumerate(writeSets):
+                otherWrites = []
+                for otherIdx, choiceIdx in enumerate(chosen):
+                    if otherIdx != setIdx:
+                        otherWrites = addFrameWrites(otherWrites, writeSets[otherIdx][choiceIdx][0])
+                scores = [scoreFor(addFrameWrites(otherWrites, actionWrites)) for actionWrites, action in writeSet]
+                bestIdx = scores.index(min(scores))
+                if scores[bestIdx] < scores[chosen[setIdx]]:
+                    chosen[setIdx] = bestIdx
+                    improved = True
+        return [writeSets[setIdx][choiceIdx][1] for setIdx, choiceIdx in enumerate(chosen)]
+
+    def transitions(self):
+        # generate results for all digit -> digit transitions (skipping digit -> same digit)
+        digitCount = len(self.digitSet)
+        for ltDigit in range(digitCount):
+            for rtDigit in range(digitCount):
+                if ltDigit != rtDigit:
+                    yield self.calcSegDiffs(ltDigit, rtDigit)
+
+# engine for the stock digits, used by calcSegDiffs()
+defaultEngine = TransitionEngine()
+
+def calcSegDiffs(ltDigit, rtDigit):
+    # calculate the segment changes between two of the stock digits
+    return defaultEngine.calcSegDiffs(ltDigit, rtDigit)
+
+# -----------------------------------------------------------------------------
+#  Glyph sets (see glyphsets.py for the definition format)
+# -----------------------------------------------------------------------------
+def modelForGlyphSet(glyphSet):
+    # return SegmentModel for the display geometry of a glyph set definition
+    segmentNames = glyphSet["segments"]
+    segmentEnums = glyphSet.get("segmentEnums") or ["SEG_{}".format(segName.upper()) for segName in segmentNames]
+    adjacentPairs = []
+    adjacentDirections = {}
+    for junction in glyphSet["junctions"]:
+        # segments meeting at a junction are adjacent, each travelling its own way to get there
+        for memberIdx, (fmName, fmDirection) in enumerate(junction):
+            for toName, toDirection in junction[memberIdx + 1:]:
+                adjacentPairs.append((fmName, toName))
+                if fmDirection is not None:
+                    adjacentDirections["{}->{}".format(fmName, toName)] = fmDirection
+                if toDirection is not None:
+                    adjacentDirections["{}->{}".format(toName, fmName)] = toDirection
+    sliding = [tuple(slidingPair) for slidingPair in glyphSet.get("sliding", [])]
+    return SegmentModel(segmentNames, adjacentPairs, adjacentDirections, sliding, list(zip(segmentNames, segmentEnums)))
+
+def engineForGlyphSet(glyphSet, search=None, segmentLength=defaultSegmentLength, cache=None, segmentWidth=1):
+    # return TransitionEngine for all glyphs of a glyph set definition
+    #  search: None for the glyph set's own "search" objective (if any)
+    if search is None:
+        search = glyphSet.get("search")
+    labels = [label for label, segments in glyphSet["glyphs"]]
+    glyphTupleSet = [tuple(segments.split()) for label, segments in glyphSet["glyphs"]]
+    return TransitionEngine(glyphTupleSet, modelForGlyphSet(glyphSet), labels, search, segmentLength, cache, segmentWidth)
+
+def loadGlyphSet(name):
+    # return stock glyph set of given name, else the definition loaded from the named .json file
+    if name in glyphsets.glyphSetDict:
+        return glyphsets.glyphSetDict[name]
+    if not os.path.exists(name):
+        raise ValueError("Unknown glyph set [{}], expected one of {} or a .json file".format(name, sorted(glyphsets.glyphSetDict)))
+    with open(name) as glyph_fp:
+        return json.load(glyph_fp)
+
+# -----------------------------------------------------------------------------
+#  Describing and emitting results
+# -----------------------------------------------------------------------------
+def conditionTextFor(action):
+    # return why an action was chosen, e.g., "seg[a] turning OFF while [b] is staying ON."
+    onOff = "OFF" if action.command == "CMD_TURN_OFF" else "ON"
+    if action.heading == "fallback":
+        return "seg[{}] turning {}, no rule fits.".format(action.segment, onOff)
+    return "seg[{}] turning {} while [{}] is {}.".format(action.segment, onOff, action.related, action.relation)
+
+def outcomeTextFor(action):
+    # return what the action does, e.g., "Segment [a] snakes OFF towards [b]"
+    if action.heading == "fallback":
+        if action.command == "CMD_TURN_OFF" and action.style != "CMD_IMMEDIATE":
+            return "Segment [{}] snakes OFF along itself".format(action.segment)
+        return "Segment [{}] turns {} immediately".format(action.segment, "OFF" if action.command == "CMD_TURN_OFF" else "ON")
+    if action.heading == "slides":
+        if action.command == "CMD_TURN_OFF":
+            return "VERT Segment [{}] slides RIGHT to [{}]".format(action.segment, action.related)
+        return "VERT Segment [{}] slides LEFT from [{}]".format(action.segment, action.related)
+    onOff = "OFF" if action.command == "CMD_TURN_OFF" else "ON"
+    if action.heading == "away":
+        return "Segment [{}] snakes {} away from [{}]".format(action.segment, onOff, action.related)
+    return "Segment [{}] snakes {} towards [{}]".format(action.segment, onOff, action.related)
+
+def spinLinesFor(result, transitionNumber, engine=None):
+    # return the spin2 DAT source lines (w/comments) for one transition
+    engine = defaultEngine if engine is None else engine
+    model = engine.model
+    fmLabel = engine.labels[result.fmDigit]
+    toLabel = engine.labels[result.toDigit]
+    nbrOn = bitCount(result.turningOn)
+    nbrOff = bitCount(result.turningOff)
+    nbrTransitions = nbrOn + nbrOff
     countSuffix = "" if (nbrTransitions == 1) else "s"
-    print_line("  {} segment{} changing, #ON={}, #OFF={}".format(nbrTransitions, countSuffix, len(turningOn), len(turningOff)), info=True)
-    print_line("\t' {} segment{} changing, #ON={}, #OFF={}".format(nbrTransitions, countSuffix, len(turningOn), len(turningOff)), code=True)
-    bHaveAdjacentSegmentsChanging = True if len(turningOff) == 0 or len(turningOn) == 0 else False
-
-    # for each segment that is changing do:
-    for segmentName in turningOff + turningOn:
-        bSegmentHandled = False
-        adjacents = adjacentSegementsFor(segmentName)
-        if len(adjacents) > 0:
-            print_line("- adjacent segments for [{}] are [{}]".format(segmentName, adjacents), verbose=True)
-            for adjacentName in adjacents:
-                if bSegmentHandled == False and segmentName in turningOff and adjacentName in stayingOn:
-                    # turning OFF with adjacent that is ALREADY ON, snake OFF into ON
-                    log_line("-   seg[{}] turning OFF while [{}] is staying ON. -> Segment [{}] snakes OFF towards [{}]!".format(segmentName, adjacentName, segmentName, adjacentName))
-                    direction = relativeDirection(segmentName, adjacentName)
-                    print_line("{}{}{} + {}CMD_TURN_OFF + {}{}".format(linePrefix, accessPrefix, segmentEnumforName(segmentName), accessPrefix, accessPrefix, actionEnumFor("towards", direction)), code=True)
-                    bSegmentHandled = True
-                elif bSegmentHandled == False and segmentName in turningOff and adjacentName in turningOn:
-                    # turning OFF with adjacent that is going ON, snake OFF into ON
-                    log_line("-   seg[{}] turning OFF while [{}] is turning ON. -> Segment [{}] snakes OFF towards [{}]!".format(segmentName, adjacentName, segmentName, adjacentName))
-                    direction = relativeDirection(segmentName, adjacentName)
-                    print_line("{}{}{} + {}CMD_TURN_OFF + {}{}".format(linePrefix, accessPrefix, segmentEnumforName(segmentName), accessPrefix, accessPrefix, actionEnumFor("towards", direction)), code=True)
-                    bSegmentHandled = True
-                elif bSegmentHandled == False and segmentName in turningOn and adjacentName in stayingOff:
-                    # turning ON with adjacent that is ALREADY OFF, snake ON into OFF
-                    log_line("-   seg[{}] turning ON while [{}] is staying OFF. -> Segment [{}] snakes ON towards [{}]!".format(segmentName, adjacentName, segmentName, adjacentName))
-                    direction = relativeDirection(segmentName, adjacentName)
-                    print_line("{}{}{} + {}CMD_TURN_ON + {}{}".format(linePrefix, accessPrefix, segmentEnumforName(segmentName), accessPrefix, accessPrefix, actionEnumFor("towards", direction)), code=True)
-                    bSegmentHandled = True
-                elif bSegmentHandled == False and segmentName in turningOn and adjacentName in turningOff:
-                    # turning ON with adjacent that is going OFF, snake ON into OFF
-                    log_line("-   seg[{}] turning ON while [{}] is turning OFF. -> Segment [{}] snakes ON towards [{}]!".format(segmentName, adjacentName, segmentName, adjacentName))
-                    direction = relativeDirection(segmentName, adjacentName)
-                    print_line("{}{}{} + {}CMD_TURN_ON + {}{}".format(linePrefix, accessPrefix, segmentEnumforName(segmentName), accessPrefix, accessPrefix, actionEnumFor("towards", direction)), code=True)
-                    bSegmentHandled = True
-                elif bSegmentHandled == False and segmentName in turningOn and adjacentName in stayingOn:
-                    # turning ON with adjacent that is going OFF, snake ON into OFF
-                    log_line("-   seg[{}] turning ON while [{}] is staying ON. -> Segment [{}] snakes ON away from [{}]!".format(segmentName, adjacentName, segmentName, adjacentName))
-                    direction = relativeDirection(segmentName, adjacentName)
-                    print_line("{}{}{} + {}CMD_TURN_ON + {}{}".format(linePrefix, accessPrefix, segmentEnumforName(segmentName), accessPrefix, accessPrefix, actionEnumFor("away", direction)), code=True)
-                    bSegmentHandled = True
-        if not bSegmentHandled and segmentName in slidingSegments:
-            sourceTuple = source0 if segmentName in source0 else source1
-            sourceName = sourceTuple[1]
-            if bSegmentHandled == False and segmentName in turningOn and sourceName in stayingOn:
-                # if our sliding segment is turning ON slide from source which is staying ON
-                log_line("-   seg[{}] turning ON while [{}] is staying ON. -> VERT Segment [{}] slides LEFT from [{}]!".format(segmentName, sourceName, segmentName, sourceName))
-                print_line("{}{}{} + {}CMD_TURN_ON + {}{}".format(linePrefix, accessPrefix, segmentEnumforName(segmentName), accessPrefix, accessPrefix, actionEnumFor("slides", "left")), code=True)
-                bSegmentHandled = True
-            elif bSegmentHandled == False and segmentName in turningOff and sourceName in stayingOn:
-                # if our sliding segment is turning OFF slide to source which is staying ON
-                log_line("-   seg[{}] turning OFF while [{}] is staying ON. -> VERT Segment [{}] slides RIGHT to [{}]!".format(segmentName, sourceName, segmentName, sourceName))
-                print_line("{}{}{} + {}CMD_TURN_OFF + {}{}".format(linePrefix, accessPrefix, segmentEnumforName(segmentName), accessPrefix, accessPrefix, actionEnumFor("slides", "right")), code=True)
-                bSegmentHandled = True
-            elif bSegmentHandled == False and segmentName in turningOff and sourceName in turningOn:
-                # if our sliding segment is turning OFF slide to source which is staying ON
-                log_line("-   seg[{}] turning OFF while [{}] is turning ON. -> VERT Segment [{}] slides RIGHT to [{}]!".format(segmentName, sourceName, segmentName, sourceName))
-                print_line("{}{}{} + {}CMD_TURN_OFF + {}{}".format(linePrefix, accessPrefix, segmentEnumforName(segmentName), accessPrefix, accessPrefix, actionEnumFor("slides", "right")), code=True)
-                bSegmentHandled = True
-            elif bSegmentHandled == False and segmentName in turningOn and sourceName in turningOff:
-                # if our sliding segment is turning ON slide away from source which is turning OFF
-                log_line("-   seg[{}] turning ON while [{}] is turning OFF. -> VERT Segment [{}] slides LEFT from [{}]!".format(segmentName, sourceName, segmentName, sourceName))
-                print_line("{}{}{} + {}CMD_TURN_ON + {}{}".format(linePrefix, accessPrefix, segmentEnumforName(segmentName), accessPrefix, accessPrefix, actionEnumFor("slides", "left")), code=True)
-                bSegmentHandled = True
-        if not bSegmentHandled:
-            print_line("- seg[{}] MISSING action".format(segmentName), warning=True)
-            warningCount += 1
-            if not segmentName in missingNameSet:
-                missingNameSet.append(segmentName)
-    print_line("{}0\t' terminate entry".format(linePrefix), code=True)
+    lines = []
+    lines.append("\n{}{}_{}\n\t' transition #{}: digit {} -> {}".format(tablePrefix, fmLabel, toLabel, transitionNumber, fmLabel, toLabel))
+    lines.append("\t' {} segment{} changing, #ON={}, #OFF={}".format(nbrTransitions, countSuffix, nbrOn, nbrOff))
+    for action in result.actions:
+        segmentEnum = model.enumTable[model.indexByName[action.segment]]
+        lines.append("\t' {}".format(conditionTextFor(action)))
+        lines.append("\t' {}".format(outcomeTextFor(action)))
+        lines.append("{}{}{} + {}{} + {}{}".format(linePrefix, accessPrefix, segmentEnum, accessPrefix, action.command, accessPrefix, action.style))
+    lines.append("{}0\t' terminate entry".format(linePrefix))
+    return lines
+
+def checkOutputFormat(model, out_format):
+    # raise ValueError when the tables of a model can't be written in out_format
+    #  (the spin2 source tables hold byte actions naming the SEG_* enums of
+    #  isp_hub75_morphSegment.spin2, which only has seven segments)
+    if out_format == 'spin' and model.segmentCount > len(segmentNameSet):
+        raise ValueError("spin2 source tables only handle {} segments, use -f dat or -f bin for {} segments".format(len(segmentNameSet), model.segmentCount))
+
+def tableChunksFor(results, engine=None, out_format='spin', packedTable=None):
+    # generate the content written by -o for results (a list or iterable) as chunks:
+    #  text for 'spin' (one chunk per transition, made as each result arrives) and
+    #  'dat' formats, bytes for 'bin'
+    #  packedTable: the packed form of results when already made (dat, bin)
+    engine = defaultEngine if engine is None else engine
+    checkOutputFormat(engine.model, out_format)
+    if out_format == 'spin':
+        for transitionNumber, result in enumerate(results, start=1):
+            yield "".join(line + "\n" for line in spinLinesFor(result, transitionNumber, engine))
+        return
+    if packedTable is None:
+        packedTable = tablepack.packTransitions(list(results), len(engine.labels), engine.model.segmentCount)
+    if out_format == 'dat':
+        yield "".join(line + "\n" for line in tablepack.datLinesFor(packedTable, engine.labels))
+    else:
+        yield tablepack.binaryFor(packedTable)
+
+def tableOutputFor(results, engine=None, out_format='spin'):
+    # return the content written by -o for a list of results: text for 'spin' and
+    #  'dat' formats, bytes for 'bin'
+    chunks = list(tableChunksFor(results, engine, out_format))
+    return b"".join(chunks) if out_format == 'bin' else "".join(chunks)
+
+def reportTransition(result, transitionNumber, engine=None):
+    # show progress on the console for one transition
+    if not logEnabled(warning=True):
+        # quiet, nothing below would be shown
+        return
+    engine = defaultEngine if engine is None else engine
+    model = engine.model
+    print_line("#{}: checking lt={}, rt={}", transitionNumber, engine.labels[result.fmDigit], engine.labels[result.toDigit], info=True)
+    if logEnabled(verbose=True):
+        for segName in model.namesForMask(result.turningOff):
+            print_line("* seg=[{}] turning OFF", segName, verbose=True)
+        for segName in model.namesForMask(result.turningOn):
+            print_line("* seg=[{}] turning ON", segName, verbose=True)
+    nbrOn = bitCount(result.turningOn)
+    nbrOff = bitCount(result.turningOff)
+    nbrTransitions = nbrOn + nbrOff
+    countSuffix = "" if (nbrTransitions == 1) else "s"
+    print_line("  {} segment{} changing, #ON={}, #OFF={}", nbrTransitions, countSuffix, nbrOn, nbrOff, info=True)
+    for action in result.actions:
+        print_line("-   {} -> {}!", conditionTextFor(action), outcomeTextFor(action))
+    for segName in result.missing:
+        print_line("- seg[{}] MISSING action", segName, warning=True)
+
+def traceRecordFor(result, engine=None):
+    # return dict describing how the actions of one transition were chosen (written
+    #  as one JSON line per transition by --trace): for each changing segment every
+    #  candidate rule in order of preference, whether it fit and what it costs (frames
+    #  and the most pixel writes in a frame on the engine's segments)
+    engine = defaultEngine if engine is None else engine
+    model = engine.model
+    changing = result.fmMask ^ result.toMask
+    stateMasks = engine.stateMasksFor(result.fmMask, result.toMask)
+    candidates = OrderedDict()
+    for segIdx, bit in enumerate(model.bitTable):
+        if changing & bit:
+            segmentState = ST_TURNING_ON if result.toMask & bit else ST_TURNING_OFF
+            candidates[model.segmentNames[segIdx]] = [OrderedDict([("style", action.style), ("related", action.related), ("relation", action.relation),
+                                                                   ("fits", (stateMasks[relatedState] & relatedBit) != 0),
+                                                                   ("frames", animationStepsFor(action.style, engine.segmentLength)),
+                                                                   ("peakWrites", max(engine.actionWritesFor(action)))])
+                                                      for relatedBit, relatedState, action in model.candidateTable[segIdx][segmentState]]
+    return OrderedDict([
+        ("fm", engine.labels[result.fmDigit]),
+        ("to", engine.labels[result.toDigit]),
+        ("fmMask", result.fmMask),
+        ("toMask", result.toMask),
+        ("search", engine.search),
+        ("actions", [action._asdict() for action in result.actions]),
+        ("missing", result.missing),
+        ("candidates", candidates),
+    ])
+
+def reportStartup():
+    # write the startup phase times (and the whole run so far) to stderr
+    for phase, seconds in startupTimes.items():
+        print("startup {:<10} {:8.2f} ms".format(phase, 1000.0 * seconds), file=sys.stderr)
+    print("run total        {:8.2f} ms (from the first import of pymorph.py)".format(1000.0 * (perf_counter() - startupStarted)), file=sys.stderr)
+
+startupTimes["tables"] = perf_counter() - startupStarted - startupTimes["imports"]
 
 # -----------------------------------------------------------------------------
 #  main application
 # -----------------------------------------------------------------------------
+def main(argv=None):
+    global opt_debug
+    global opt_verbose
+    global opt_quiet
+    global opt_writeOutput
+    global console_fp
+
+    signal(SIGPIPE,SIG_DFL)
+
+    # Parsing command-line options
+    parser = argparse.ArgumentParser(description=script_info, epilog='For further details see: ' + project_url)
+    parser.add_argument("-v", "--verbose", help="increase output (v)erbosity", action="store_true")
+    parser.add_argument("-d", "--debug", help="show (d)ebug output", action="store_true")
+    parser.add_argument("-q", "--quiet", help="(q)uiet, show errors only", action="store_true")
+    parser.add_argument("-t", '--trace_filename', help='write how each transition\'s actions were chosen to file as JSON lines', default='')
+    parser.add_argument("-o", '--out_filename', help='write actions to output file (replaced only when its content changes), - for stdout', default='')
+    parser.add_argument("-z", '--gzip', help='g(z)ip the output (default: when the output file name ends with .gz)', action="store_true")
+    parser.add_argument("-f", '--out_format', help='output (f)ormat: spin2 source tables (spin), packed spin2 DAT block (dat) or packed binary (bin)', choices=['spin', 'dat', 'bin'], default='spin')
+    parser.add_argument("-s", '--search', help='(s)earch every rule which fits for the choice with the fewest animation steps, frames or pixel writes in the busiest frame (default: first rule which fits)', choices=searchObjectiveSet, default=None)
+    parser.add_argument("-l", '--segment_length', help='segment length (pixels) used to count animation steps when searching (default: {})'.format(defaultSegmentLength), type=segmentLengthArg, default=defaultSegmentLength)
+    parser.add_argument("-w", '--segment_width', help='segment (w)idth (pixels) used to count pixel writes when searching for pixels (default: 1)', type=segmentWidthArg, default=1)
+    parser.add_argument("-g", '--glyph_set', help='glyph set to generate: {} or a .json definition file (default: stock digits)'.format(", ".join(sorted(glyphsets.glyphSetDict))), default='')
+    parser.add_argument("-c", '--cache_file', help='reuse results stored in this (c)ache file, only transitions whose glyphs or rules changed are recomputed', default='')
+    parser.add_argument("-p", '--profile', help='show how often each kind of rule chose an action and the time taken by each phase', action="store_true")
+    parser.add_argument('--profile_filename', help='write the rule hit counts and phase times to file as JSON', default='')
+    parser.add_argument('--profile_startup', help='report the time taken by imports, table setup and option parsing to stderr', action="store_true")
+    startTime = perf_counter()
+    parse_args = parser.parse_args(argv)
+    startupTimes["arguments"] = perf_counter() - startTime
+
+    opt_debug = parse_args.debug
+    opt_verbose = parse_args.verbose
+    opt_quiet = parse_args.quiet
+    out_filename = parse_args.out_filename
+    opt_writeOutput = len(out_filename) > 0
+    if out_filename == '-':
+        console_fp = sys.stderr
+
+    print_line(script_info, info=True)
+    if opt_verbose:
+        print_line('Verbose enabled', info=True)
+    if opt_debug:
+        print_line('Debug enabled', debug=True)
+    if opt_writeOutput:
+        print_line('Writing output to: {}', out_filename, debug=True)
+
+    cache = morphcache.TransitionCache(parse_args.cache_file) if len(parse_args.cache_file) > 0 else None
+    if len(parse_args.glyph_set) > 0:
+        try:
+            engine = engineForGlyphSet(loadGlyphSet(parse_args.glyph_set), parse_args.search, parse_args.segment_length, cache, parse_args.segment_width)
+        except (ValueError, KeyError) as error:
+            print_line('Bad glyph set {}: {}', parse_args.glyph_set, error, error=True)
+            return 1
+    else:
+        engine = TransitionEngine(search=parse_args.search, segmentLength=parse_args.segment_length, cache=cache, segmentWidth=parse_args.segment_width)
+    if opt_writeOutput:
+        try:
+            checkOutputFormat(engine.model, parse_args.out_format)
+        except ValueError as error:
+            print_line('Can\'t write {}: {}', out_filename, error, error=True)
+            return 1
+
+    print_line("- plotting segment transitions", info=True)
+
+    profile = None
+    timedItems = lambda items, phase: items
+    timeCall = lambda phase, function, *args: function(*args)
+    if parse_args.profile or len(parse_args.profile_filename) > 0:
+        profile = morphprofile.GeneratorProfile()
+        engine.profile = profile
+        timedItems = profile.timedItems
+        timeCall = profile.timeCall
+
+    trace_fp = None
+    results = []
+
+    def generatedResults():
+        # generate each transition, reporting (and tracing) it as it is computed
+        for transitionNumber, result in enumerate(timedItems(engine.transitions(), "generation"), start=1):
+            reportTransition(result, transitionNumber, engine)
+            if trace_fp is not None:
+                trace_fp.write(json.dumps(traceRecordFor(result, engine)) + "\n")
+            if profile is not None:
+                profile.countResult(result, engine.model)
+            results.append(result)
+            yield result
+
+    compress = parse_args.gzip or None
+    written = None
+    try:
+        if len(parse_args.trace_filename) > 0:
+            trace_fp = open(parse_args.trace_filename, "w")
+        if opt_writeOutput and parse_args.out_format == 'spin':
+            # spin2 source is written as the transitions are generated
+            print_line("Output started", debug=True)
+            chunks = tableChunksFor(timedItems(generatedResults(), "reporting"), engine)
+            written = timeCall("writing", tablewrite.writeChunks, timedItems(chunks, "emission"), out_filename, compress)
+        else:
+            for result in timedItems(generatedResults(), "reporting"):
+                pass
+    except OSError as error:
+        # the table or the trace
+        print_line('Unable to write {}: {}', error.filename if error.filename else out_filename, error, error=True)
+        return 1
+    finally:
+        if trace_fp is not None:
+            trace_fp.close()
+
+    warningCount = 0
+    missingNameSet = []
+    for result in results:
+        warningCount += len(result.missing)
+        for segmentName in result.missing:
+            if not segmentName in missingNameSet:
+                missingNameSet.append(segmentName)
+    countSuffix = "" if (warningCount == 1) else "s"
+    print_line("* {} segment{} not yet handled!", warningCount, countSuffix, info=True)
+    if len(missingNameSet) > 0:
+        print_line("** named {}", missingNameSet, info=True)
 
-print_line("- plotting segment transitions", info=True)
+    if parse_args.out_format != 'spin':
+        packedTable = timeCall("packing", tablepack.packTransitions, results, len(engine.labels), engine.model.segmentCount)
+        for line in tablepack.reportLinesFor(packedTable):
+            print_line(line, info=True)
+        if opt_writeOutput:
+            print_line("Output started", debug=True)
+            try:
+                chunks = tableChunksFor(results, engine, parse_args.out_format, packedTable)
+                written = timeCall("writing", tablewrite.writeChunks, timedItems(chunks, "emission"), out_filename, compress)
+            except OSError as error:
+                print_line('Unable to write {}: {}', out_filename, error, error=True)
+                return 1
 
-for ltDigit in range(10):
-    for rtDigit in range(10):
-        if ltDigit != rtDigit:
-            calcSegDiffs(ltDigit, rtDigit)
+    if cache is not None:
+        print_line("- cache {}: {} reused, {} computed", parse_args.cache_file, cache.hits, cache.misses, info=True)
+        cache.save()
 
-countSuffix = "" if (warningCount == 1) else "s"
-print_line("* {} segment{} not yet handled!".format(warningCount, countSuffix), info=True)
-if len(missingNameSet) > 0:
-    print_line("** named {}".format(missingNameSet), info=True)
+    if opt_writeOutput:
+        print_line('File {} - {}', out_filename, "written" if written else "unchanged", verbose=True)
+    if profile is not None:
+        if parse_args.profile:
+            # shown even with -q, it was asked for
+            for line in profile.reportLines():
+                print(line, file=console_fp)
+        if len(parse_args.profile_filename) > 0:
+            try:
+                tablewrite.writeAtomically(parse_args.profile_filename, json.dumps(profile.asDict(), indent=2) + "\n")
+            except OSError as error:
+                print_line('Unable to write {}: {}', parse_args.profile_filename, error, error=True)
+                return 1
+    if parse_args.profile_startup:
+        reportStartup()
+    return 0
 
-if opt_writeOutput:
-    print_line('File {} - closed'.format(out_filename), verbose=True)
-    out_fp.close()
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+
+# -----------------------------------------------------------------------------
+#  Packed (direct-indexed) transition tables for pymorph.py
+# -----------------------------------------------------------------------------
+# The spin2 source tables (see Docs/transition-table.out) hold one zero-terminated
+#  action list per transition found by walking two levels of LONG pointer tables.
+#  The packed form replaces these with:
+#
+#   index   - glyphCount x glyphCount WORD byte-offsets into the action pool, the
+#             actions for (from, to) start at pool + index[from * glyphCount + to]
+#   pool    - zero-terminated action lists, each distinct list is stored once and
+#             a list which is the tail of a longer list points into that list.
+#             Offset 0 is always an empty list (used for from == to)
+#
+# Actions are bytes (segment + command + style, as in the spin2 source) when there
+#  are 7 segments or fewer, else words.
+#
+# Binary layout (little-endian, as read by the P2):
+#   WORD glyphCount, BYTE actionWidth, BYTE 0, WORD index[glyphCount * glyphCount], pool...
+
+import struct
+from collections import namedtuple
+
+# size of the header of the binary form
+binaryHeaderBytes = 4
+
+# bytes used by each entry of the spin2 source pointer tables
+pointerBytes = 4
+
+# table sizes (in bytes) and sharing counts
+#   linkedBytes - size of the spin2 source layout (pointer tables plus one list per transition)
+#   packedBytes - size of the binary form (header, index and pool)
+PackStats = namedtuple('PackStats', ['transitionCount', 'actionCount', 'uniqueLists', 'sharedLists', 'tailLists', 'linkedBytes', 'packedBytes'])
+
+# a packed table
+#   index - list of pool offsets (in actions), [from * glyphCount + to]
+#   pool  - list of action values
+#   users - dict of pool offset: list of (from, to) using the list at that offset
+PackedTable = namedtuple('PackedTable', ['glyphCount', 'actionWidth', 'index', 'pool', 'users', 'stats'])
+
+def actionWidthFor(segmentCount):
+    # return bytes needed for each action of a display with segmentCount segments
+    return 1 if segmentCount <= 7 else 2
+
+def packTransitions(results, glyphCount, segmentCount):
+    # return PackedTable for the TransitionResults of all (from, to) pairings of glyphCount glyphs
+    actionWidth = actionWidthFor(segmentCount)
+    listByPair = {}
+    actionCount = 0
+    for result in results:
+        listByPair[(result.fmDigit, result.toDigit)] = tuple(action.code for action in result.actions)
+        actionCount += len(result.actions)
+
+    # place longest lists first so shorter lists can share their tails
+    offsetByList = {(): 0}
+    pool = [0]
+    uniqueLists = 0
+    tailLists = 0
+    for actionList in sorted(set(listByPair.values()), key=lambda actionList: (-len(actionList), actionList)):
+        if actionList in offsetByList:
+            if len(actionList) > 0:
+                tailLists += 1
+            continue
+        uniqueLists += 1
+        listOffset = len(pool)
+        pool.extend(actionList)
+        pool.append(0)
+        # every tail of this list is also a zero-terminated list
+        for tailIdx in range(len(actionList)):
+            offsetByList.setdefault(actionList[tailIdx:], listOffset + tailIdx)
+
+    index = [0] * (glyphCount * glyphCount)
+    users = {}
+    for (fmGlyph, toGlyph), actionList in listByPair.items():
+        listOffset = offsetByList[actionList]
+        index[fmGlyph * glyphCount + toGlyph] = listOffset
+        users.setdefault(listOffset, []).append((fmGlyph, toGlyph))
+    if len(pool) * actionWidth > 0xFFFF:
+        raise ValueError("Packed action pool of {} bytes does not fit WORD offsets".format(len(pool) * actionWidth))
+
+    transitionCount = len(listByPair)
+    linkedBytes = pointerBytes * (glyphCount + glyphCount * glyphCount) + (actionCount + transitionCount) * actionWidth
+    packedBytes = binaryHeaderBytes + 2 * len(index) + actionWidth * len(pool)
+    sharedLists = sum(len(pairs) for pairs in users.values() if len(pairs) > 1)
+    stats = PackStats(transitionCount, actionCount, uniqueLists, sharedLists, tailLists, linkedBytes, packedBytes)
+    return PackedTable(glyphCount, actionWidth, index, pool, users, stats)
+
+def binaryFor(packedTable):
+    # return the binary form of a packed table
+    actionFormat = "B" if packedTable.actionWidth == 1 else "H"
+    header = struct.pack("<HBB", packedTable.glyphCount, packedTable.actionWidth, 0)
+    index = struct.pack("<{}H".format(len(packedTable.index)), *[listOffset * packedTable.actionWidth for listOffset in packedTable.index])
+    pool = struct.pack("<{}{}".format(len(packedTable.pool), actionFormat), *packedTable.pool)
+    return header + index + pool
+
+def actionListsFromBinary(data):
+    # return (glyphCount, dict of (from, to): list of action values) read from the binary form
+    #  raises ValueError when data is not a whole packed table
+    if len(data) < binaryHeaderBytes:
+        raise ValueError("Packed table of {} bytes is shorter than its header".format(len(data)))
+    glyphCount, actionWidth, reserved = struct.unpack_from("<HBB", data, 0)
+    if actionWidth not in (1, 2):
+        raise ValueError("Bad action width {} in packed table".format(actionWidth))
+    indexCount = glyphCount * glyphCount
+    poolStart = binaryHeaderBytes + 2 * indexCount
+    if len(data) < poolStart + actionWidth:
+        raise ValueError("Packed table of {} bytes is too short for the index of {} glyphs and its action pool".format(len(data), glyphCount))
+    offsets = struct.unpack_from("<{}H".format(indexCount), data, binaryHeaderBytes)
+    actionFormat = "<B" if actionWidth == 1 else "<H"
+    actionLists = {}
+    for pairIdx, byteOffset in enumerate(offsets):
+        actions = []
+        actionOffset = poolStart + byteOffset
+        while True:
+            if actionOffset + actionWidth > len(data):
+                raise ValueError("Action list of ({}, {}) runs past the end of the table".format(pairIdx // glyphCount, pairIdx % glyphCount))
+            value = struct.unpack_from(actionFormat, data, actionOffset)[0]
+            if value == 0:
+                break
+            actions.append(value)
+            actionOffset += actionWidth
+        actionLists[(pairIdx // glyphCount, pairIdx % glyphCount)] = actions
+    return glyphCount, actionLists
+
+def datLinesFor(packedTable, labels):
+    # return spin2 DAT source lines for a packed table (offsets are in bytes)
+    glyphCount = packedTable.glyphCount
+    actionWidth = packedTable.actionWidth
+    actionType = "byte" if actionWidth == 1 else "word"
+    valueFormat = "${:02X}" if actionWidth == 1 else "${:04X}"
+    lines = []
+    lines.append("' packed morph table: {} glyphs, {} bytes".format(glyphCount, packedTable.stats.packedBytes))
+    lines.append("'  pActions := @morphActions + word[@morphIndex][fromGlyph * {} + toGlyph]".format(glyphCount))
+    lines.append("morphGlyphCount")
+    lines.append("\tword\t{}".format(glyphCount))
+    lines.append("\tbyte\t{}, 0".format(actionWidth))
+    lines.append("morphIndex")
+    for fmGlyph in range(glyphCount):
+        rowOffsets = packedTable.index[fmGlyph * glyphCount:(fmGlyph + 1) * glyphCount]
+        lines.append("\tword\t{}\t' fm{}_*".format(", ".join(str(listOffset * actionWidth) for listOffset in rowOffsets), labels[fmGlyph]))
+    lines.append("morphActions")
+    listOffset = 0
+    pool = packedTable.pool
+    while listOffset < len(pool):
+        listEnd = pool.index(0, listOffset)
+        values = [valueFormat.format(value) for value in pool[listOffset:listEnd]] + ["0"]
+        # name the transitions starting anywhere in this list
+        userNames = []
+        for tailOffset in range(listOffset, listEnd + 1):
+            for fmGlyph, toGlyph in sorted(packedTable.users.get(tailOffset, [])):
+                userNames.append("{}_{}".format(labels[fmGlyph], labels[toGlyph]))
+        comment = "no actions" if listOffset == 0 else "fm " + ", ".join(userNames)
+        lines.append("\t{}\t{}\t' {}".format(actionType, ", ".join(values), comment))
+        listOffset = listEnd + 1
+    return lines
+
+def reportLinesFor(packedTable):
+    # return lines describing the size of a packed table vs. the spin2 source layout
+    stats = packedTable.stats
+    savedBytes = stats.linkedBytes - stats.packedBytes
+    savedPercent = (100.0 * savedBytes / stats.linkedBytes) if stats.linkedBytes > 0 else 0.0
+    lines = []
+    lines.append("{} transitions, {} actions in {} distinct lists ({} more are tails of longer lists)".format(stats.transitionCount, stats.actionCount, stats.uniqueLists, stats.tailLists))
+    lines.append("{} transitions share a list with another transition".format(stats.sharedLists))
+    lines.append("linked tables {} bytes, packed table {} bytes, saved {} bytes ({:.1f}%)".format(stats.linkedBytes, stats.packedBytes, savedBytes, savedPercent))
+    return lines
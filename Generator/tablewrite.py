@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+# -----------------------------------------------------------------------------
+#  Writing generated tables for pymorph.py
+# -----------------------------------------------------------------------------
+# Tables are produced as a stream of chunks (see pymorph.tableChunksFor()) which
+#  are written in one buffered pass, optionally gzip compressed, either to stdout
+#  or to a temporary file in the destination directory which is renamed over the
+#  destination once complete. Readers never see a partly written table and, when
+#  the new table is the same as the file already there, the file is left alone
+#  (so its modification time does not trigger rebuilds).
+
+import os
+import sys
+import stat
+
+# NOTE: gzip, tempfile and filecmp are imported by the functions using them, they
+#  add to the startup time of every script importing this module
+
+# size of the write buffer, so a large table is written with few system calls
+defaultBufferBytes = 1 << 20
+
+def isCompressedName(filename):
+    return filename.endswith(".gz")
+
+def _newFileMode(filename):
+    # return permission bits for the file replacing filename (those of the
+    #  existing file, else the usual ones for a new file)
+    if os.path.exists(filename):
+        return stat.S_IMODE(os.stat(filename).st_mode)
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+def _writeTo(raw_fp, chunks, compress):
+    # write chunks (str or bytes) to a binary file object
+    if compress:
+        import gzip
+    out_fp = gzip.GzipFile(filename="", mode="wb", fileobj=raw_fp, mtime=0) if compress else raw_fp
+    for chunk in chunks:
+        out_fp.write(chunk.encode() if isinstance(chunk, str) else chunk)
+    if compress:
+        out_fp.close()
+
+def writeChunks(chunks, filename, compress=None, bufferBytes=defaultBufferBytes):
+    # write chunks (str or bytes) to filename, "-" for stdout
+    #  compress: gzip the output, None to compress when filename ends with .gz
+    #  returns False (and leaves the file alone) when the content is unchanged
+    if compress is None:
+        compress = isCompressedName(filename)
+    if filename == "-":
+        _writeTo(sys.stdout.buffer, chunks, compress)
+        sys.stdout.buffer.flush()
+        return True
+    import filecmp
+    import tempfile
+    out_fd, tempName = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(filename)), prefix=".{}.".format(os.path.basename(filename)))
+    try:
+        with os.fdopen(out_fd, "wb", buffering=bufferBytes) as raw_fp:
+            _writeTo(raw_fp, chunks, compress)
+        if os.path.isfile(filename) and filecmp.cmp(tempName, filename, shallow=False):
+            os.unlink(tempName)
+            return False
+        os.chmod(tempName, _newFileMode(filename))
+        os.replace(tempName, filename)
+    except BaseException:
+        if os.path.exists(tempName):
+            os.unlink(tempName)
+        raise
+    return True
+
+def writeAtomically(filename, content, compress=False):
+    # replace filename with content (str or bytes), see writeChunks()
+    return writeChunks([content], filename, compress)
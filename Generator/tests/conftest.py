@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+
+# the Generator scripts import each other by module name
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+# tests of batch job loading and generation, see morphbatch.py
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+import morphbatch
+
+class JobsFromFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, "jobs.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def jobsFor(self, jobList):
+        with open(self.filename, "w") as job_fp:
+            json.dump(jobList, job_fp)
+        return morphbatch.jobsFromFile(self.filename, "tables")
+
+    def test_defaults(self):
+        jobs = self.jobsFor([{"glyph_set": "hex"}, {"glyph_set": "digits", "out_format": "dat", "out_filename": "d.dat"}])
+        self.assertEqual(jobs[0].outFilename, os.path.join("tables", "hex.out"))
+        self.assertEqual(jobs[1].outFilename, "d.dat")
+
+    def test_segment_width(self):
+        jobs = self.jobsFor([{"glyph_set": "hex", "segment_width": 2}, {"glyph_set": "digits"}])
+        self.assertEqual([job.segmentWidth for job in jobs], [2, 1])
+
+    def test_bad_segment_size(self):
+        for badJob in [{"segment_length": 1}, {"segment_length": "9"}, {"segment_width": 0}]:
+            badJob["glyph_set"] = "hex"
+            with self.assertRaises(ValueError):
+                self.jobsFor([badJob])
+
+    def test_not_a_list(self):
+        with self.assertRaises(ValueError):
+            self.jobsFor({"glyph_set": "hex"})
+
+    def test_entry_not_a_dict(self):
+        for badEntry in [1, "hex", ["hex"], None]:
+            with self.assertRaises(ValueError):
+                self.jobsFor([{"glyph_set": "digits"}, badEntry])
+
+    def test_entry_without_glyph_set(self):
+        with self.assertRaises(ValueError):
+            self.jobsFor([{"search": "frames"}])
+
+    def test_unknown_setting(self):
+        with self.assertRaises(ValueError):
+            self.jobsFor([{"glyph_set": "hex", "serach": "frames"}])
+
+class GenerateJobsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cacheFilename = os.path.join(self.directory, "cache.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        morphbatch.initWorker(None)
+
+    def test_jobs_share_one_cache(self):
+        jobs = [morphbatch.jobFor("digits", None, 6, "spin", "."), morphbatch.jobFor("digits", None, 6, "dat", ".")]
+        firstResult, secondResult = morphbatch.generateJobs(jobs, 1, self.cacheFilename)
+        # the second job hits the entries the first added, and returns none of its own
+        self.assertEqual(len(firstResult.cacheEntries), 90)
+        self.assertEqual(secondResult.cacheEntries, {})
+        self.assertEqual(morphbatch.workerCache.hits, 90)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+# tests of the content-addressed transition cache, see morphcache.py
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+import glyphsets
+import morphcache
+import pymorph
+
+def digitsWithoutSliding():
+    # stock digits whose [e] and [f] can't slide as a column (so have fewer rules)
+    glyphSet = dict(glyphsets.glyphSetDict["digits"])
+    glyphSet["sliding"] = []
+    return glyphSet
+
+class CacheKeyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = pymorph.TransitionEngine()
+        self.masks = self.engine.digitMaskSet
+
+    def tearDown(self):
+        pymorph.ruleSetVersion = self.ruleSetVersion
+
+    ruleSetVersion = pymorph.ruleSetVersion
+
+    def test_same_inputs_same_key(self):
+        other = pymorph.TransitionEngine()
+        self.assertEqual(self.engine.cacheKeyFor(self.masks[8], self.masks[9]), other.cacheKeyFor(self.masks[8], self.masks[9]))
+        self.assertNotEqual(self.engine.cacheKeyFor(self.masks[8], self.masks[9]), self.engine.cacheKeyFor(self.masks[9], self.masks[8]))
+
+    def test_rule_set_version_changes_every_key(self):
+        before = self.engine.cacheKeyFor(self.masks[1], self.masks[7])
+        pymorph.ruleSetVersion += 1
+        self.assertNotEqual(pymorph.TransitionEngine().cacheKeyFor(self.masks[1], self.masks[7]), before)
+
+    def test_rule_change_misses_only_where_it_could_fire(self):
+        engine = pymorph.engineForGlyphSet(digitsWithoutSliding())
+        # 1 -> 7 only turns [a] on: its rules are unchanged
+        self.assertEqual(engine.cacheKeyFor(self.masks[1], self.masks[7]), self.engine.cacheKeyFor(self.masks[1], self.masks[7]))
+        # 8 -> 9 turns [e] off: it lost its column slide rules
+        self.assertNotEqual(engine.cacheKeyFor(self.masks[8], self.masks[9]), self.engine.cacheKeyFor(self.masks[8], self.masks[9]))
+
+    def test_model_change_changes_key(self):
+        glyphSet = dict(glyphsets.glyphSetDict["digits"])
+        # same segments, [a] meets [b] first then [f] the other way round
+        glyphSet["junctions"] = [glyphSet["junctions"][1], glyphSet["junctions"][0]] + glyphSet["junctions"][2:]
+        engine = pymorph.engineForGlyphSet(glyphSet)
+        self.assertNotEqual(engine.cacheKeyFor(self.masks[1], self.masks[7]), self.engine.cacheKeyFor(self.masks[1], self.masks[7]))
+
+    def test_search_settings_change_key(self):
+        frames6 = pymorph.TransitionEngine(search="frames", segmentLength=6)
+        frames9 = pymorph.TransitionEngine(search="frames", segmentLength=9)
+        key = self.engine.cacheKeyFor(self.masks[8], self.masks[9])
+        self.assertEqual(len(set([key, frames6.cacheKeyFor(self.masks[8], self.masks[9]), frames9.cacheKeyFor(self.masks[8], self.masks[9])])), 3)
+
+class TransitionCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, "cache.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def resultsWith(self, cache):
+        return [(result.actions, result.missing) for result in pymorph.TransitionEngine(cache=cache).transitions()]
+
+    def test_saved_results_are_reused(self):
+        expected = self.resultsWith(None)
+        cache = morphcache.TransitionCache(self.filename)
+        self.assertEqual(self.resultsWith(cache), expected)
+        self.assertTrue(cache.save())
+        cache = morphcache.TransitionCache(self.filename)
+        self.assertEqual(self.resultsWith(cache), expected)
+        self.assertEqual(cache.misses, 0)
+        self.assertFalse(cache.save())
+
+    def test_damaged_file_is_rebuilt(self):
+        with open(self.filename, "w") as cache_fp:
+            cache_fp.write("{not json")
+        cache = morphcache.TransitionCache(self.filename)
+        self.assertEqual(self.resultsWith(cache), self.resultsWith(None))
+        self.assertEqual(cache.hits, 0)
+
+    def test_wrong_shape_file_is_a_miss(self):
+        with open(self.filename, "w") as cache_fp:
+            json.dump([1, 2, 3], cache_fp)
+        cache = morphcache.TransitionCache(self.filename)
+        self.assertEqual(cache.entries, {})
+        self.assertEqual(self.resultsWith(cache), self.resultsWith(None))
+
+    def test_wrong_shape_entries_are_misses(self):
+        engine = pymorph.TransitionEngine()
+        masks = engine.digitMaskSet
+        keys = [engine.cacheKeyFor(masks[fmDigit], masks[toDigit]) for fmDigit, toDigit in [(0, 1), (1, 2), (2, 3), (3, 4)]]
+        badEntries = [5, [[1, 2], []], [[["a"]], []], {"actions": []}]
+        with open(self.filename, "w") as cache_fp:
+            json.dump(dict(zip(keys, badEntries)), cache_fp)
+        cache = morphcache.TransitionCache(self.filename)
+        for key in keys:
+            self.assertIsNone(cache.get(key, pymorph.SegmentAction))
+        self.assertEqual(cache.hits, 0)
+        self.assertEqual(self.resultsWith(cache), self.resultsWith(None))
+        # the bad entries are replaced when saved
+        cache.save()
+        cache = morphcache.TransitionCache(self.filename)
+        self.assertEqual(self.resultsWith(cache), self.resultsWith(None))
+        self.assertEqual(cache.misses, 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+
+# tests of the rule hit and phase time report, see morphprofile.py
+
+import unittest
+
+import morphprofile
+import pymorph
+
+class ReportLinesTest(unittest.TestCase):
+
+    def test_empty_profile(self):
+        # no rule hits and (with a stopped clock) no time at all
+        profile = morphprofile.GeneratorProfile()
+        profile.totalSeconds = lambda: 0.0
+        lines = profile.reportLines()
+        self.assertEqual(lines[0].split()[-1], "%")
+        self.assertTrue(all(line.split()[-1] == "0.0" for line in lines[2:-1]))
+
+    def test_missing_segments_only(self):
+        profile = morphprofile.GeneratorProfile()
+        profile.countHit("missing", "CMD_TURN_ON")
+        self.assertEqual(profile.reportLines()[1].split()[-1], "100.0")
+
+    def test_counts_every_action(self):
+        engine = pymorph.TransitionEngine()
+        profile = morphprofile.GeneratorProfile()
+        for result in engine.transitions():
+            profile.countResult(result, engine.model)
+        self.assertEqual(profile.transitionCount, 90)
+        self.assertEqual(sum(sum(counts.values()) for counts in profile.ruleCounts.values()),
+                         sum(len(result.actions) + len(result.missing) for result in engine.transitions()))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+
+# tests of the panel renderer's checks, see morphrender.py
+
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+if numpy is not None:
+    import morphrender
+import pymorph
+
+@unittest.skipIf(numpy is None, "needs NumPy")
+class MainTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.out_filename = os.path.join(self.directory, "frames.raw")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def render(self, *args):
+        return morphrender.main(["-o", self.out_filename] + list(args))
+
+    def test_values(self):
+        self.assertEqual(self.render("--values", "0959,1000"), 0)
+        self.assertEqual(os.path.getsize(self.out_filename) % (morphrender.panelColumns * morphrender.panelRows * 3), 0)
+
+    def test_single_value(self):
+        self.assertEqual(self.render("--values", "5"), 1)
+
+    def test_values_of_different_lengths(self):
+        self.assertEqual(self.render("--values", "959,1000"), 1)
+
+    def test_values_wider_than_the_panel(self):
+        self.assertEqual(self.render("--values", "12345678901,12345678902"), 1)
+        # fit on two chained panels
+        self.assertEqual(self.render("--values", "12345678901,12345678902", "--chain", "2"), 0)
+
+    def test_digits_taller_than_the_panel(self):
+        with self.assertRaises(ValueError):
+            morphrender.MorphRenderer(pymorph.TransitionEngine(), morphrender.groupPlacements(1, 1, 1, 15, (0xFF, 0, 0)))
+
+if __name__ == '__main__':
+    unittest.main()
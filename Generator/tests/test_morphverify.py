@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+# tests of the transition table verifier, see morphverify.py
+
+import unittest
+
+import glyphsets
+import morphverify
+import pymorph
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+class StockTablesTest(unittest.TestCase):
+
+    @unittest.skipIf(numpy is None, "needs NumPy")
+    def test_letters_pixels(self):
+        # letters default to a search whose fallbacks must leave no pixel lit
+        self.assertEqual(morphverify.main(["-p", "-g", "letters"]), 0)
+
+    def test_fallbacks_turn_off_with_a_drawable_snake(self):
+        for glyphSetName in sorted(glyphsets.glyphSetDict):
+            model = pymorph.modelForGlyphSet(glyphsets.glyphSetDict[glyphSetName])
+            drawableStyles = morphverify.drawableStylesFor(model)
+            for segIdx, (turnOn, turnOff) in enumerate(model.fallbackTable):
+                self.assertEqual(turnOn.style, "CMD_IMMEDIATE")
+                self.assertNotEqual(turnOff.style, "CMD_IMMEDIATE")
+                self.assertIn(turnOff.style, drawableStyles[segIdx])
+
+class VerifyActionsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.model = pymorph.sevenSegmentModel
+        self.verifier = morphverify.TableVerifier(self.model)
+        self.masks = pymorph.TransitionEngine().digitMaskSet
+
+    def code(self, segName, command, style):
+        segIdx = self.model.indexByName[segName]
+        return self.model.actionFor(segIdx, command, style, segIdx, "", "test").code
+
+    def verify(self, fmDigit, toDigit, codes, verifier=None):
+        return (verifier or self.verifier).verifyActions(fmDigit, toDigit, self.masks[fmDigit], self.masks[toDigit], codes)
+
+    def test_generated_list(self):
+        # 8 -> 9 turns [e] OFF
+        verification = self.verify(8, 9, [self.code("e", "CMD_TURN_OFF", "CMD_COL_TO_RT")])
+        self.assertTrue(verification.ok)
+        self.assertEqual(verification.problems, [])
+        self.assertEqual(verification.frameCount, pymorph.defaultSegmentLength - 1)
+
+    def test_style_segment_cant_draw(self):
+        # [e] is vertical, the spin2 update routine aborts on a horizontal snake
+        verification = self.verify(8, 9, [self.code("e", "CMD_TURN_OFF", "CMD_LT_TO_RT")])
+        self.assertFalse(verification.ok)
+        self.assertIn("can't draw", verification.problems[0])
+
+    def test_wrong_end_state(self):
+        verification = self.verify(8, 9, [self.code("d", "CMD_TURN_OFF", "CMD_LT_TO_RT")])
+        self.assertFalse(verification.ok)
+        self.assertEqual(verification.problems, ["left ON: e", "left OFF: d"])
+
+    def test_missing_action(self):
+        verification = self.verify(8, 9, [])
+        self.assertFalse(verification.ok)
+        self.assertEqual(verification.problems, ["left ON: e"])
+
+    def test_segment_field_out_of_range(self):
+        verification = self.verify(8, 9, [0x0F])
+        self.assertFalse(verification.ok)
+        self.assertIn("names no segment", verification.problems[0])
+
+    def test_recommand_for_start_state_is_ignored(self):
+        # [e] is still ON while snaking OFF, so turning it ON again is ignored
+        codes = [self.code("e", "CMD_TURN_OFF", "CMD_TOP_DOWN"), self.code("e", "CMD_TURN_ON", "CMD_TOP_DOWN")]
+        verification = self.verify(8, 9, codes)
+        self.assertTrue(verification.ok)
+        self.assertEqual(verification.problems, ["seg[e] commanded more than once", "seg[e] is still ON, command ignored"])
+
+    def test_recommand_restarts_animation(self):
+        # a second OFF restarts the animation with its own style (and step count)
+        codes = [self.code("e", "CMD_TURN_OFF", "CMD_TOP_DOWN"), self.code("e", "CMD_TURN_OFF", "CMD_COL_TO_RT")]
+        verification = self.verify(8, 9, codes)
+        self.assertTrue(verification.ok)
+        self.assertEqual(verification.frameCount, pymorph.defaultSegmentLength - 1)
+
+    def test_recommand_then_wrong_state(self):
+        # turned OFF, then ON again once the OFF (IMMEDIATE, one step) completed
+        codes = [self.code("e", "CMD_TURN_OFF", "CMD_IMMEDIATE"), self.code("e", "CMD_TURN_ON", "CMD_TOP_DOWN")]
+        verification = self.verify(8, 9, codes)
+        self.assertFalse(verification.ok)
+        self.assertIn("left ON: e", verification.problems)
+
+    def test_animation_which_never_completes(self):
+        # a column slide of a 0 pixel segment has a step count of -1
+        verifier = morphverify.TableVerifier(self.model, 0)
+        verification = self.verify(8, 9, [self.code("e", "CMD_TURN_OFF", "CMD_COL_TO_RT")], verifier)
+        self.assertFalse(verification.ok)
+        self.assertIn("never completes", verification.problems[-1])
+
+if __name__ == '__main__':
+    unittest.main()
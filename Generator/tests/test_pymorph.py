@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+
+# tests of the pymorph.py command line, see pymorph.main()
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import pymorph
+
+class MainTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.missingDirectory = os.path.join(self.directory, "missing")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_trace_file_not_writable(self):
+        self.assertEqual(pymorph.main(["-q", "-t", os.path.join(self.missingDirectory, "trace.jsonl")]), 1)
+
+    def test_profile_file_not_writable(self):
+        out_filename = os.path.join(self.directory, "table.out")
+        self.assertEqual(pymorph.main(["-q", "-o", out_filename, "--profile_filename", os.path.join(self.missingDirectory, "profile.json")]), 1)
+        # the table is written before the profile
+        self.assertTrue(os.path.exists(out_filename))
+
+    def test_profile_file(self):
+        profile_filename = os.path.join(self.directory, "profile.json")
+        self.assertEqual(pymorph.main(["-q", "--profile_filename", profile_filename]), 0)
+        self.assertTrue(os.path.exists(profile_filename))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+# tests of the packed (direct-indexed) table form, see tablepack.py
+
+import struct
+import unittest
+from collections import namedtuple
+
+import glyphsets
+import pymorph
+import tablepack
+
+# just what packTransitions() reads of a TransitionResult / SegmentAction
+FakeResult = namedtuple('FakeResult', ['fmDigit', 'toDigit', 'actions'])
+FakeAction = namedtuple('FakeAction', ['code'])
+
+def fakeResults(actionLists):
+    # return results for a dict of (from, to): list of action values
+    return [FakeResult(fmGlyph, toGlyph, [FakeAction(code) for code in codes]) for (fmGlyph, toGlyph), codes in sorted(actionLists.items())]
+
+class PackTransitionsTest(unittest.TestCase):
+
+    def test_digits_round_trip(self):
+        engine = pymorph.TransitionEngine()
+        results = list(engine.transitions())
+        packedTable = tablepack.packTransitions(results, len(engine.labels), engine.model.segmentCount)
+        glyphCount, actionLists = tablepack.actionListsFromBinary(tablepack.binaryFor(packedTable))
+        self.assertEqual(glyphCount, 10)
+        for result in results:
+            self.assertEqual(actionLists[(result.fmDigit, result.toDigit)], [action.code for action in result.actions])
+        for glyph in range(glyphCount):
+            self.assertEqual(actionLists[(glyph, glyph)], [])
+        self.assertEqual(packedTable.stats.packedBytes, len(tablepack.binaryFor(packedTable)))
+
+    def test_word_actions_round_trip(self):
+        engine = pymorph.engineForGlyphSet(glyphsets.glyphSetDict["alnum16"])
+        results = list(engine.transitions())
+        packedTable = tablepack.packTransitions(results, len(engine.labels), engine.model.segmentCount)
+        self.assertEqual(packedTable.actionWidth, 2)
+        self.assertTrue(max(packedTable.pool) > 0xFF)
+        glyphCount, actionLists = tablepack.actionListsFromBinary(tablepack.binaryFor(packedTable))
+        for result in results:
+            self.assertEqual(actionLists[(result.fmDigit, result.toDigit)], [action.code for action in result.actions])
+
+    def test_identical_lists_are_stored_once(self):
+        packedTable = tablepack.packTransitions(fakeResults({(0, 1): [0x41, 0x23], (1, 0): [0x41, 0x23]}), 2, 7)
+        self.assertEqual(packedTable.index[0 * 2 + 1], packedTable.index[1 * 2 + 0])
+        self.assertEqual(packedTable.stats.uniqueLists, 1)
+        self.assertEqual(packedTable.stats.sharedLists, 2)
+        self.assertEqual(packedTable.pool, [0, 0x41, 0x23, 0])
+
+    def test_tail_shares_longer_list(self):
+        packedTable = tablepack.packTransitions(fakeResults({(0, 1): [0x41, 0x23, 0x65], (1, 0): [0x23, 0x65]}), 2, 7)
+        self.assertEqual(packedTable.index[1 * 2 + 0], packedTable.index[0 * 2 + 1] + 1)
+        self.assertEqual(packedTable.stats.tailLists, 1)
+        self.assertEqual(packedTable.pool, [0, 0x41, 0x23, 0x65, 0])
+        glyphCount, actionLists = tablepack.actionListsFromBinary(tablepack.binaryFor(packedTable))
+        self.assertEqual(actionLists[(1, 0)], [0x23, 0x65])
+
+    def test_pool_must_fit_word_offsets(self):
+        def distinctLists(glyphCount):
+            # a different two action list for every (from, to) pair
+            pairs = [(fmGlyph, toGlyph) for fmGlyph in range(glyphCount) for toGlyph in range(glyphCount) if fmGlyph != toGlyph]
+            return dict((pair, [(pairIdx // 255) + 1, (pairIdx % 255) + 1]) for pairIdx, pair in enumerate(pairs))
+        # 150 glyphs: 22350 lists of 3 bytes
+        with self.assertRaises(ValueError):
+            tablepack.packTransitions(fakeResults(distinctLists(150)), 150, 7)
+        packedTable = tablepack.packTransitions(fakeResults(distinctLists(100)), 100, 7)
+        self.assertTrue(len(packedTable.pool) <= 0xFFFF)
+
+class ActionListsFromBinaryTest(unittest.TestCase):
+
+    def setUp(self):
+        engine = pymorph.TransitionEngine()
+        results = list(engine.transitions())
+        self.data = tablepack.binaryFor(tablepack.packTransitions(results, len(engine.labels), engine.model.segmentCount))
+
+    def test_shorter_than_header(self):
+        with self.assertRaises(ValueError):
+            tablepack.actionListsFromBinary(self.data[:3])
+
+    def test_truncated_index(self):
+        with self.assertRaises(ValueError):
+            tablepack.actionListsFromBinary(self.data[:10])
+
+    def test_truncated_pool(self):
+        with self.assertRaises(ValueError):
+            tablepack.actionListsFromBinary(self.data[:-3])
+
+    def test_bad_action_width(self):
+        with self.assertRaises(ValueError):
+            tablepack.actionListsFromBinary(struct.pack("<HBB", 1, 3, 0) + self.data[4:])
+
+    def test_offset_past_end(self):
+        badIndex = struct.pack("<HBB", 1, 1, 0) + struct.pack("<H", 100) + b"\x00"
+        with self.assertRaises(ValueError):
+            tablepack.actionListsFromBinary(badIndex)
+
+if __name__ == '__main__':
+    unittest.main()